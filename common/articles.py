@@ -0,0 +1,198 @@
+import csv
+import gzip
+import io
+from array import array
+from typing import Generator, Iterable, NamedTuple
+
+from nomenklatura.util import PathLike
+
+from common.lazy import lazy_module
+
+np = lazy_module("numpy")
+
+Ids = tuple[str, str, str]  # pmid, pmcid, doi
+Journal = tuple[str, str, str]  # title, issn, eissn
+
+CHUNK_SIZE = 1_000_000
+
+
+def to_int(value: str, prefix: str = "") -> int:
+    value = value.strip()
+    if prefix and value.upper().startswith(prefix):
+        value = value[len(prefix) :]
+    try:
+        return int(value)
+    except ValueError:
+        return 0
+
+
+class Work(NamedTuple):
+    pmid: str
+    pmc: str
+    doi: str
+    year: str
+    journal: Journal | None
+
+
+def stream_ids(
+    path: PathLike, columns: tuple[str, str, str] = ("PMID", "PMCID", "DOI")
+) -> Generator[Ids, None, None]:
+    with gzip.open(path) as zf:
+        with io.TextIOWrapper(zf) as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            pmid, pmc, doi = (header.index(c) for c in columns)
+            for row in reader:
+                yield row[pmid], row[pmc], row[doi]
+
+
+def stream_journals(
+    path: PathLike,
+) -> Generator[tuple[str, str, str, str, Journal], None, None]:
+    # PMC-ids.csv.gz also has the publication year and journal of each row
+    columns = ("PMID", "PMCID", "DOI", "Year", "Journal Title", "ISSN", "eISSN")
+    with gzip.open(path) as zf:
+        with io.TextIOWrapper(zf) as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            pmid, pmc, doi, year, title, issn, eissn = (
+                header.index(c) for c in columns
+            )
+            for row in reader:
+                journal = row[title], row[issn], row[eissn]
+                yield row[pmid], row[pmc], row[doi], row[year], journal
+
+
+def iter_groups(
+    keys: "np.ndarray", order: "np.ndarray"
+) -> Generator[tuple[int, list[int]], None, None]:
+    # yield (key, row positions) for each run of equal keys along `order`
+    key, rows = None, []
+    for start in range(0, len(order), CHUNK_SIZE):
+        chunk = order[start : start + CHUNK_SIZE]
+        for ix, value in zip(chunk.tolist(), keys[chunk].tolist()):
+            if value != key:
+                if rows:
+                    yield key, rows
+                key, rows = value, []
+            rows.append(ix)
+    if rows:
+        yield key, rows
+
+
+class ArticleIndex:
+    """
+    Compact identifier index for (PMID, PMCID, DOI) triples from several
+    sources. PMIDs and PMCIDs are kept as unsigned ints in plain arrays, DOIs
+    are concatenated into one buffer, so that the memory footprint stays a few
+    bytes per row instead of three python strings. The publication year and
+    journal of a row are optional, journals are interned into a small table
+    and referenced by number. Rows added first take precedence when merging.
+    """
+
+    def __init__(self):
+        self.pmids = array("I")
+        self.pmcs = array("I")
+        self.dois = bytearray()
+        self.doi_offsets = array("Q", [0])
+        self.years = array("H")
+        self.journals = array("I")
+        self.journal_table: list[Journal | None] = [None]
+        self.journal_ids: dict[Journal, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.pmids)
+
+    def add(
+        self,
+        pmid: str,
+        pmc: str,
+        doi: str,
+        year: str = "",
+        journal: Journal | None = None,
+    ):
+        self.pmids.append(to_int(pmid))
+        self.pmcs.append(to_int(pmc, "PMC"))
+        self.dois += doi.strip().encode()
+        self.doi_offsets.append(len(self.dois))
+        year = to_int(year)
+        self.years.append(year if 0 < year < 2**16 else 0)
+        self.journals.append(self.get_journal_id(journal))
+
+    def get_journal_id(self, journal: Journal | None) -> int:
+        if journal is None or not journal[0].strip():
+            return 0
+        journal = tuple(v.strip() for v in journal)
+        ix = self.journal_ids.get(journal)
+        if ix is None:
+            ix = self.journal_ids[journal] = len(self.journal_table)
+            self.journal_table.append(journal)
+        return ix
+
+    def add_many(self, rows: Iterable[tuple]) -> int:
+        ix = 0
+        for ix, row in enumerate(rows, 1):
+            self.add(*row)
+        return ix
+
+    def get_doi(self, ix: int) -> str:
+        return self.dois[self.doi_offsets[ix] : self.doi_offsets[ix + 1]].decode()
+
+    def merge_rows(self, rows: list[int]) -> tuple[int, str, int, int]:
+        pmc, doi, year, journal = 0, "", 0, 0
+        for ix in rows:
+            pmc = pmc or self.pmcs[ix]
+            doi = doi or self.get_doi(ix)
+            year = year or self.years[ix]
+            journal = journal or self.journals[ix]
+            if pmc and doi and year and journal:
+                break
+        return pmc, doi, year, journal
+
+    def make_work(self, pmid: int, rows: list[int]) -> Work:
+        pmc, doi, year, journal = self.merge_rows(rows)
+        return Work(
+            str(pmid) if pmid else "",
+            f"PMC{pmc}" if pmc else "",
+            doi,
+            str(year) if year else "",
+            self.journal_table[journal],
+        )
+
+    def iter_articles(self) -> Generator[Work, None, None]:
+        """
+        Yield one merged `Work` per article: rows are grouped by PMID, and rows
+        without PMID are merged into the group of their PMCID. The remaining
+        rows without PMID are grouped by PMCID, and rows with only a DOI are
+        passed through.
+        """
+        pmids = np.frombuffer(self.pmids, dtype=np.uint32)
+        pmcs = np.frombuffer(self.pmcs, dtype=np.uint32)
+        order = np.argsort(pmids, kind="stable")
+        orphans = int(np.count_nonzero(pmids == 0))
+        orphan_rows = order[:orphans]
+        orphan_rows = orphan_rows[np.argsort(pmcs[orphan_rows], kind="stable")]
+        orphan_pmcs = pmcs[orphan_rows]
+        doi_only = int(np.count_nonzero(orphan_pmcs == 0))
+
+        resolved = array("I")
+        for pmid, rows in iter_groups(pmids, order[orphans:]):
+            pmc = next((self.pmcs[ix] for ix in rows if self.pmcs[ix]), 0)
+            if pmc:
+                lo = np.searchsorted(orphan_pmcs, pmc, "left")
+                hi = np.searchsorted(orphan_pmcs, pmc, "right")
+                rows.extend(orphan_rows[lo:hi].tolist())
+                resolved.append(pmc)
+            yield self.make_work(pmid, rows)
+
+        for start in range(0, doi_only, CHUNK_SIZE):
+            for ix in orphan_rows[start : min(start + CHUNK_SIZE, doi_only)].tolist():
+                if self.get_doi(ix):
+                    yield self.make_work(0, [ix])
+
+        resolved = np.sort(np.frombuffer(resolved, dtype=np.uint32))
+        for pmc, rows in iter_groups(pmcs, orphan_rows[doi_only:]):
+            pos = np.searchsorted(resolved, pmc)
+            if pos < len(resolved) and resolved[pos] == pmc:
+                continue
+            yield self.make_work(0, rows)
@@ -14,6 +14,7 @@ def build_catalog(catalog_in: PathLike):
         catalog_in_data = yaml.safe_load(fh)
     catalog = DataCatalog(ZavodDataset, {})
     catalog.updated_at = datetime_iso(datetime.utcnow())
+    statistics = {}
     for ds_data in catalog_in_data["datasets"]:
         include_url: Optional[str] = ds_data.pop("include", None)
         if include_url is not None:
@@ -23,11 +24,18 @@ def build_catalog(catalog_in: PathLike):
             except Exception as exc:
                 print("ERROR [%s]: %s" % (include_url, exc))
                 continue
+        stats = ds_data.get("statistics")
         ds = catalog.make_dataset(ds_data)
+        if stats is not None:
+            statistics[ds.name] = stats
         print("Dataset: %r" % ds)
 
+    data = catalog.to_dict()
+    for ds_data in data["datasets"]:
+        if ds_data["name"] in statistics:
+            ds_data["statistics"] = statistics[ds_data["name"]]
     with open("catalog.json", "w") as fh:
-        json.dump(catalog.to_dict(), fh)
+        json.dump(data, fh)
 
 
 if __name__ == "__main__":
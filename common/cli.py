@@ -0,0 +1,85 @@
+import argparse
+from contextlib import ExitStack, contextmanager
+from typing import Generator
+
+from zavod import Zavod
+
+from common.memory import get_container_limit, get_governor, parse_size
+from common.pipeline import HIGH_WATERMARK, LOW_WATERMARK, pipeline
+from common.sampling import get_sampler
+
+
+def make_parser(description: str | None = None) -> argparse.ArgumentParser:
+    """
+    Argument parser with the options shared by all `parse.py` entry points,
+    datasets can add their own arguments to it.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Write emitted entities from a dedicated thread via a bounded queue",
+    )
+    parser.add_argument(
+        "--queue-high",
+        type=int,
+        default=HIGH_WATERMARK,
+        help="Queue depth at which parsing pauses (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--queue-low",
+        type=int,
+        default=LOW_WATERMARK,
+        help="Queue depth at which parsing resumes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes for datasets that are parsed per file "
+        "(default: number of cpus)",
+    )
+    parser.add_argument(
+        "--memory-limit",
+        type=parse_size,
+        default=get_container_limit(),
+        help="Memory budget (e.g. `4G`) at which caches and buffers are "
+        "released (default: the container limit, if any)",
+    )
+    parser.add_argument(
+        "--sample",
+        type=float,
+        default=None,
+        metavar="RATE",
+        help="Only parse the records whose key hashes below RATE (0 < RATE <= 1)",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Stop after N (sampled) records, per work unit for datasets "
+        "that are parsed per file",
+    )
+    return parser
+
+
+@contextmanager
+def configure(context: Zavod, args: argparse.Namespace) -> Generator[Zavod, None, None]:
+    """
+    Set up the runtime options from `args` around a dataset context and yield
+    the context the parser should use.
+    """
+    get_governor().configure(args.memory_limit, log=context.log)
+    sampler = get_sampler()
+    sampler.configure(args.sample, args.limit)
+    if sampler.active:
+        context.log.warning(
+            "Partial run: sample rate %s, limit %s" % (args.sample, args.limit)
+        )
+    with ExitStack() as stack:
+        if args.pipeline:
+            context = stack.enter_context(
+                pipeline(context, args.queue_high, args.queue_low)
+            )
+        yield context
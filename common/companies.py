@@ -0,0 +1,177 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from functools import cache, lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import Iterable
+
+from followthemoney.util import make_entity_id
+from nomenklatura.util import PathLike
+
+from common.lazy import lazy_function
+from common.memory import get_governor
+from common.unionfind import UnionFind
+
+fp = lazy_function("fingerprints", "generate")
+
+INDEX_PATH = Path(__file__).parent / "companies.csv"
+PREFIX = "ftg-company"
+
+
+@lru_cache(maxsize=100_000)
+def fingerprint(name: str) -> str | None:
+    return fp(name)
+
+
+get_governor().register(
+    "company fingerprints",
+    lambda: fingerprint.cache_info().currsize * 200,
+    fingerprint.cache_clear,
+)
+
+
+class CompanyIndex:
+    """
+    Read-only mapping of known company entity ids (`id:<entity id>`) and
+    normalized names (`name:<fingerprint>`) to one canonical company id that
+    is shared across datasets. The canonical ids are interned, so every key
+    of a company points to the same string object.
+    """
+
+    def __init__(self, mapping: dict[str, str]):
+        self.mapping = MappingProxyType(mapping)
+
+    def __len__(self) -> int:
+        return len(self.mapping)
+
+    def get(self, entity_id: str | None, name: str | None = None) -> str | None:
+        if not self.mapping:
+            return None
+        if entity_id is not None:
+            canonical = self.mapping.get(f"id:{entity_id}")
+            if canonical is not None:
+                return canonical
+        if name:
+            key = fingerprint(name)
+            if key is not None:
+                return self.mapping.get(f"name:{key}")
+
+    @classmethod
+    def load(cls, path: PathLike) -> "CompanyIndex":
+        mapping = {}
+        with open(path) as fh:
+            for key, canonical in csv.reader(fh):
+                mapping[key] = sys.intern(canonical)
+        return cls(mapping)
+
+
+@cache
+def get_index() -> CompanyIndex:
+    path = os.environ.get("FTG_COMPANY_INDEX", INDEX_PATH)
+    return CompanyIndex.load(path)
+
+
+def canonical_id(entity_id: str | None, name: str | None = None) -> str | None:
+    """
+    Return the canonical id for a company minted by a dataset parser, or the
+    given id if the company is not in the index.
+    """
+    if entity_id is None:
+        return None
+    return get_index().get(entity_id, name) or entity_id
+
+
+def get_payers(path: PathLike) -> set[str]:
+    payers = set()
+    with open(path) as fh:
+        for line in fh:
+            if '"Payment"' in line:
+                data = json.loads(line)
+                payers.update(data["properties"].get("payer", []))
+    return payers
+
+
+def load_seed(companies: UnionFind, path: PathLike):
+    # keep the keys and canonical ids of a previous index, exports built with
+    # it only contain the canonical ids of the companies it knows
+    with open(path) as fh:
+        for key, canonical in csv.reader(fh):
+            companies.union(key, f"canonical:{canonical}")
+
+
+def get_key(entity_id: str) -> str:
+    if entity_id.startswith(f"{PREFIX}-"):
+        return f"canonical:{entity_id}"
+    return f"id:{entity_id}"
+
+
+def build_index(
+    paths: Iterable[PathLike],
+    out_path: PathLike = INDEX_PATH,
+    seed: PathLike | None = None,
+) -> int:
+    """
+    Build the index from exported datasets: all payers of payments are
+    grouped by the fingerprints of their names. The index is seeded from
+    `seed` (the previous index), a group keeps its existing canonical id (the
+    smallest, if previous groups were merged) and new groups get one derived
+    from their smallest fingerprint.
+    """
+    companies = UnionFind()
+    if seed is not None and Path(seed).exists():
+        load_seed(companies, seed)
+    for path in paths:
+        payers = get_payers(path)
+        with open(path) as fh:
+            for line in fh:
+                data = json.loads(line)
+                if data["id"] not in payers:
+                    continue
+                key = get_key(data["id"])
+                companies.intern(key)
+                for name in data["properties"].get("name", []):
+                    name = fingerprint(name)
+                    if name:
+                        companies.union(key, f"name:{name}")
+
+    existing: dict[int, str] = {}
+    names: dict[int, str] = {}
+    for ix, key in enumerate(companies.keys):
+        if key.startswith("canonical:"):
+            groups = existing
+        elif key.startswith("name:"):
+            groups = names
+        else:
+            continue
+        root = companies.find(ix)
+        if root not in groups or key < groups[root]:
+            groups[root] = key
+    rows = []
+    for ix, key in enumerate(companies.keys):
+        if key.startswith("canonical:"):
+            continue
+        root = companies.find(ix)
+        if root in existing:
+            rows.append((key, existing[root].removeprefix("canonical:")))
+        elif root in names:
+            rows.append((key, f"{PREFIX}-{make_entity_id(names[root])}"))
+    with open(out_path, "w") as fh:
+        csv.writer(fh).writerows(sorted(rows))
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the company index")
+    parser.add_argument("entities", nargs="+", help="Exported dataset entities")
+    parser.add_argument("-o", "--out", default=INDEX_PATH, help="Index file")
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="Don't keep the canonical ids of the existing index file",
+    )
+    args = parser.parse_args()
+    keys = build_index(args.entities, args.out, None if args.fresh else args.out)
+    print("Wrote %d company keys to %s" % (keys, args.out))
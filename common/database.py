@@ -0,0 +1,240 @@
+import json
+import re
+import sqlite3
+from pathlib import Path
+from typing import Any, Iterable
+
+from nomenklatura.util import PathLike
+from zavod import Zavod, init_context
+
+from common.export import ENTITIES, INDEX, PUBLISH_URL, update_index
+
+DATABASE = "export/entities.sqlite"
+MIME_TYPE = "application/vnd.sqlite3"
+BATCH_SIZE = 50_000
+COMMIT_SIZE = 1_000_000
+
+# edge schemata: table, source and target property, further (smallest) values.
+# Every edge entity is one row, so amounts can be summed. If an end has more
+# than one value the row has the smallest one and all of them are in `links`.
+TABLES = {
+    "Payment": (
+        "payments",
+        "payer",
+        "beneficiary",
+        ("date", "amount", "amountEur", "currency", "purpose", "project"),
+    ),
+    "Membership": (
+        "memberships",
+        "member",
+        "organization",
+        ("role", "date", "startDate", "endDate"),
+    ),
+    "Ownership": (
+        "ownerships",
+        "owner",
+        "asset",
+        ("role", "date", "startDate", "percentage", "sharesValue"),
+    ),
+    "ProjectParticipant": (
+        "participations",
+        "participant",
+        "project",
+        ("role", "date", "startDate", "endDate"),
+    ),
+}
+NUMERIC = ("amount", "amountEur", "percentage", "sharesValue")
+PRAGMAS = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -262144",
+)
+
+
+def to_column(prop: str) -> str:
+    return re.sub(r"(?<!^)([A-Z])", r"_\1", prop).lower()
+
+
+def to_number(value: str) -> float | None:
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def get_value(props: dict[str, list[str]], prop: str) -> Any:
+    values = props.get(prop)
+    if not values:
+        return None
+    if prop in NUMERIC:
+        numbers = [n for n in map(to_number, values) if n is not None]
+        return min(numbers, default=None)
+    return min(values)
+
+
+def get_type(prop: str) -> str:
+    return "REAL" if prop in NUMERIC else "TEXT"
+
+
+def get_schema(table: str, source: str, target: str, columns: Iterable[str]) -> str:
+    columns = ", ".join(f"{to_column(c)} {get_type(c)}" for c in columns)
+    return (
+        f"CREATE TABLE {table} (id TEXT NOT NULL, "
+        f"{to_column(source)} TEXT, {to_column(target)} TEXT, {columns})"
+    )
+
+
+def get_indexes() -> list[str]:
+    indexes = [
+        "CREATE INDEX entities_id ON entities (id)",
+        "CREATE INDEX entities_schema ON entities (schema)",
+        "CREATE INDEX links_id ON links (id)",
+        "CREATE INDEX links_entity ON links (entity)",
+    ]
+    for table, source, target, columns in TABLES.values():
+        indexed = ["id", to_column(source), to_column(target)]
+        if "date" in columns:
+            indexed.append("date")
+        for column in indexed:
+            indexes.append(f"CREATE INDEX {table}_{column} ON {table} ({column})")
+    return indexes
+
+
+def make_edges(data: dict[str, Any]) -> Iterable[tuple[str, tuple[Any, ...]]]:
+    table, source, target, columns = TABLES[data["schema"]]
+    props = data["properties"]
+    values = tuple(get_value(props, c) for c in columns)
+    ends = (get_value(props, source), get_value(props, target))
+    yield table, (data["id"], *ends, *values)
+    for prop in (source, target):
+        entities = props.get(prop) or []
+        if len(entities) > 1:
+            for entity in sorted(entities):
+                yield "links", (data["id"], to_column(prop), entity)
+
+
+class Loader:
+    """
+    Buffered bulk inserts into the export database, committed in large
+    transactions.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.buffers: dict[str, list[tuple[Any, ...]]] = {"entities": [], "links": []}
+        self.statements = {
+            "entities": "INSERT INTO entities VALUES (?, ?, ?, ?)",
+            "links": "INSERT INTO links VALUES (?, ?, ?)",
+        }
+        for table, _, _, columns in TABLES.values():
+            self.buffers[table] = []
+            params = ", ".join("?" * (len(columns) + 3))
+            self.statements[table] = f"INSERT INTO {table} VALUES ({params})"
+        self.counts = {table: 0 for table in self.buffers}
+        self.uncommitted = 0
+
+    def add(self, table: str, row: tuple[Any, ...]):
+        buffer = self.buffers[table]
+        buffer.append(row)
+        if len(buffer) >= BATCH_SIZE:
+            self.flush(table)
+
+    def flush(self, table: str):
+        buffer = self.buffers[table]
+        self.conn.executemany(self.statements[table], buffer)
+        self.counts[table] += len(buffer)
+        self.uncommitted += len(buffer)
+        buffer.clear()
+        if self.uncommitted >= COMMIT_SIZE:
+            self.conn.commit()
+            self.uncommitted = 0
+
+    def close(self):
+        for table in self.buffers:
+            self.flush(table)
+        self.conn.commit()
+
+
+def build_database(entities: PathLike, path: PathLike) -> dict[str, int]:
+    """
+    Load an exported `entities.ftm.json` into a SQLite database with one
+    `entities` table (id, schema, name, properties as json) and normalized
+    edge tables for payments, memberships, ownerships and project
+    participations with one row per edge. Edges with several sources or
+    targets list all of them in `links` (edge id, column, entity id). Indexes
+    are created after the bulk load.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.unlink(missing_ok=True)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        conn.execute(
+            "CREATE TABLE entities (id TEXT NOT NULL, schema TEXT NOT NULL, "
+            "name TEXT, properties TEXT)"
+        )
+        for table, source, target, columns in TABLES.values():
+            conn.execute(get_schema(table, source, target, columns))
+        conn.execute(
+            "CREATE TABLE links (id TEXT NOT NULL, prop TEXT NOT NULL, "
+            "entity TEXT NOT NULL)"
+        )
+
+        loader = Loader(conn)
+        with open(entities) as fh:
+            for line in fh:
+                data = json.loads(line)
+                props = data.get("properties", {})
+                name = get_value(props, "name")
+                loader.add(
+                    "entities",
+                    (data["id"], data["schema"], name, json.dumps(props)),
+                )
+                if data["schema"] in TABLES:
+                    for table, row in make_edges(data):
+                        loader.add(table, row)
+        loader.close()
+
+        for index in get_indexes():
+            conn.execute(index)
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+    tmp_path.replace(path)
+    return loader.counts
+
+
+def get_resource_url(index: dict[str, Any], name: str) -> str:
+    # next to the published json export
+    for resource in index.get("resources", []):
+        if resource.get("name") == "entities.ftm.json":
+            return resource["url"].rsplit("/", 1)[0] + f"/{name}"
+    return f"{PUBLISH_URL}/{index['name']}/{name}"
+
+
+def export_database(context: Zavod):
+    path = context.get_resource_path(DATABASE)
+    counts = build_database(context.get_resource_path(ENTITIES), path)
+    context.log.info("Exported database", fp=path.name, **counts)
+
+    with open(context.get_resource_path(INDEX)) as fh:
+        index = json.load(fh)
+    resources = [r for r in index.get("resources", []) if r.get("name") != path.name]
+    resources.append(
+        {
+            "name": path.name,
+            "url": get_resource_url(index, path.name),
+            "mime_type": MIME_TYPE,
+            "size": path.stat().st_size,
+        }
+    )
+    update_index(context, {"resources": resources})
+
+
+if __name__ == "__main__":
+    with init_context("metadata.yml") as context:
+        export_database(context)
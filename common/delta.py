@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Generator, NamedTuple
+
+import requests
+from nomenklatura.util import PathLike
+from zavod import Zavod, init_context
+
+from common.digest import EntityDigest, hash_entity
+from common.export import ENTITIES, INDEX, PUBLISH_URL, update_index
+from common.fetch import fetch_file
+
+MANIFEST = "export/entities.hashes.tsv"
+PREVIOUS = "delta/previous.hashes.tsv"
+DELTA = "export/delta"
+
+
+class Row(NamedTuple):
+    id: str
+    hash: str
+    offset: int
+
+
+def write_manifest(entities: PathLike, manifest: PathLike):
+    """
+    Write the `id, content hash, line offset` manifest of an entities file,
+    sorted by id (in byte order, the same as python string comparison).
+    """
+    manifest = Path(manifest)
+    tmp_path = manifest.with_name(manifest.name + ".tmp")
+    with open(entities, "rb") as fh, open(tmp_path, "w") as out:
+        offset = 0
+        for line in fh:
+            data = json.loads(line)
+            out.write("%s\t%s\t%d\n" % (data["id"], hash_entity(data), offset))
+            offset += len(line)
+    env = {**os.environ, "LC_ALL": "C"}
+    cmd = ["sort", "-t", "\t", "-k1,1", "-o", str(manifest), str(tmp_path)]
+    subprocess.run(cmd, env=env, check=True)
+    tmp_path.unlink()
+
+
+def read_manifest(path: PathLike) -> Generator[Row, None, None]:
+    with open(path) as fh:
+        for line in fh:
+            entity_id, entity_hash, offset = line.rstrip("\n").split("\t")
+            yield Row(entity_id, entity_hash, int(offset))
+
+
+def diff(
+    previous: Generator[Row, None, None], current: Generator[Row, None, None]
+) -> Generator[tuple[str, Row], None, None]:
+    """
+    Merge-join two manifests sorted by id and yield `(op, row)` for every
+    added, changed or removed entity.
+    """
+    prev, curr = next(previous, None), next(current, None)
+    while prev is not None or curr is not None:
+        if curr is None or (prev is not None and prev.id < curr.id):
+            yield "removed", prev
+            prev = next(previous, None)
+        elif prev is None or curr.id < prev.id:
+            yield "added", curr
+            curr = next(current, None)
+        else:
+            if prev.hash != curr.hash:
+                yield "changed", curr
+            prev, curr = next(previous, None), next(current, None)
+
+
+def write_delta(
+    entities: PathLike, previous: PathLike, current: PathLike, out_dir: Path
+) -> dict[str, int]:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    counts = {"added": 0, "changed": 0, "removed": 0}
+    with (
+        open(entities, "rb") as fh,
+        open(out_dir / "added.ftm.json", "wb") as added,
+        open(out_dir / "changed.ftm.json", "wb") as changed,
+        open(out_dir / "removed.txt", "w") as removed,
+    ):
+        outputs = {"added": added, "changed": changed}
+        for op, row in diff(read_manifest(previous), read_manifest(current)):
+            counts[op] += 1
+            if op == "removed":
+                removed.write(row.id + "\n")
+            else:
+                fh.seek(row.offset)
+                outputs[op].write(fh.readline())
+    return counts
+
+
+def get_base_digest(manifest: PathLike) -> str:
+    # the digest of the previous run, see `common.digest`
+    digest = EntityDigest()
+    for row in read_manifest(manifest):
+        digest.add(row.hash)
+    return digest.hexdigest()
+
+
+def fetch_previous(context: Zavod, location: str) -> Path | None:
+    if not location.startswith(("http://", "https://")):
+        return Path(location) if Path(location).exists() else None
+    path = context.get_resource_path(PREVIOUS)
+    try:
+        fetch_file(context, location, path)
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            return None
+        raise
+    return path
+
+
+def export_delta(context: Zavod, previous: str | None = None):
+    """
+    Write the hash manifest of the exported entities and the changes since
+    the previously published manifest to `delta/<version>/` (`added` and
+    `changed` entities, `removed` ids). The new version is referenced as
+    `delta` in `index.json`, together with the digest of its base version.
+    """
+    entities = context.get_resource_path(ENTITIES)
+    manifest = context.get_resource_path(MANIFEST)
+    write_manifest(entities, manifest)
+
+    if previous is None:
+        with open(context.get_resource_path(INDEX)) as fh:
+            name = json.load(fh)["name"]
+        previous = f"{PUBLISH_URL}/{name}/entities.hashes.tsv"
+    previous_path = fetch_previous(context, previous)
+    if previous_path is None:
+        context.log.warning("No previous manifest, skipping delta.", url=previous)
+        return
+
+    version = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    out_dir = context.get_resource_path(f"{DELTA}/{version}")
+    counts = write_delta(entities, previous_path, manifest, out_dir)
+    if not any(counts.values()):
+        shutil.rmtree(out_dir)
+        context.log.info("No changes since the previous version.")
+        return
+    delta = {
+        "version": version,
+        "url": f"delta/{version}/",
+        "base": get_base_digest(previous_path),
+        **counts,
+    }
+    update_index(context, {"delta": delta})
+    context.log.info("Exported delta", **delta)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=export_delta.__doc__)
+    parser.add_argument(
+        "--previous",
+        help="Previous manifest (path or url, default: the published one)",
+    )
+    args = parser.parse_args()
+    with init_context("metadata.yml") as context:
+        export_delta(context, args.previous)
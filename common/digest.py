@@ -0,0 +1,118 @@
+import argparse
+import hashlib
+import json
+import sys
+from typing import Any
+
+from nomenklatura.util import PathLike
+
+from common.lazy import lazy_module
+
+requests = lazy_module("requests")
+
+MODULUS = 2**256
+PREFIX = "sha256-sum:"
+# keys of `index.json` that depend on the entities or the run, the others come
+# from the dataset metadata
+RUN_KEYS = ("updated_at", "statistics", "digest", "delta")
+
+
+def canonical_json(data: dict[str, Any]) -> bytes:
+    # only the content of an entity, not its (run dependent) timestamps or the
+    # order of its property values
+    props = {k: sorted(set(v)) for k, v in data.get("properties", {}).items() if v}
+    entity = {"id": data["id"], "schema": data["schema"], "properties": props}
+    return json.dumps(entity, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def hash_entity(data: dict[str, Any]) -> str:
+    return hashlib.sha256(canonical_json(data)).hexdigest()
+
+
+class EntityDigest:
+    """
+    Order-independent digest of an entity set: the sum of the sha256 hashes
+    of the canonical entities modulo 2^256. It can be computed in one pass
+    over an unsorted stream, and two exports have the same digest if they
+    contain the same entities in whatever order.
+    """
+
+    def __init__(self):
+        self.value = 0
+        self.entities = 0
+
+    def update(self, data: dict[str, Any]):
+        self.add(hash_entity(data))
+
+    def add(self, entity_hash: str):
+        self.value = (self.value + int(entity_hash, 16)) % MODULUS
+        self.entities += 1
+
+    def hexdigest(self) -> str:
+        return PREFIX + format(self.value, "064x")
+
+
+def compute_digest(path: PathLike) -> EntityDigest:
+    digest = EntityDigest()
+    with open(path) as fh:
+        for line in fh:
+            digest.update(json.loads(line))
+    return digest
+
+
+def load_index(location: str) -> dict[str, Any] | None:
+    if location.startswith(("http://", "https://")):
+        res = requests.get(location, timeout=30)
+        if res.status_code == 404:
+            return None
+        res.raise_for_status()
+        return res.json()
+    try:
+        with open(location) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def get_metadata(index: dict[str, Any]) -> dict[str, Any]:
+    metadata = {k: v for k, v in index.items() if k not in RUN_KEYS}
+    resources = (
+        {k: v for k, v in r.items() if k != "size"} for r in index.get("resources", [])
+    )
+    metadata["resources"] = sorted(resources, key=lambda r: r.get("name", ""))
+    return metadata
+
+
+def compare(local: str, published: str) -> bool:
+    """
+    Check if the entity digests and the dataset metadata (title, summary,
+    resources, ...) of two `index.json` files (local paths or urls) match.
+    Missing files or digests never match.
+    """
+    local_index = load_index(local) or {}
+    published_index = load_index(published) or {}
+    digest = local_index.get("digest")
+    if digest is None or digest != published_index.get("digest"):
+        return False
+    return get_metadata(local_index) == get_metadata(published_index)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entity set digests")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compute = commands.add_parser("compute", help="Print the digest of entities")
+    compute.add_argument("entities", nargs="+", help="Entities files")
+    cmp = commands.add_parser(
+        "compare",
+        help="Exit with 0 if the digests and metadata of two index.json match",
+    )
+    cmp.add_argument("local", help="Local index.json")
+    cmp.add_argument("published", help="Published index.json (path or url)")
+    args = parser.parse_args()
+
+    if args.command == "compute":
+        for path in args.entities:
+            digest = compute_digest(path)
+            print("%s\t%d\t%s" % (digest.hexdigest(), digest.entities, path))
+    else:
+        sys.exit(0 if compare(args.local, args.published) else 1)
@@ -0,0 +1,23 @@
+import json
+from typing import Any
+
+from zavod import Zavod
+
+INDEX = "export/index.json"
+ENTITIES = "export/entities.ftm.json"
+PUBLISH_URL = "https://data.followthegrant.org"
+
+
+def update_index(context: Zavod, data: dict[str, Any], refresh: bool = False):
+    """
+    Merge `data` into the dataset's published `index.json`. With `refresh`
+    (or if there is none yet) the dataset metadata is exported first.
+    """
+    path = context.get_resource_path(INDEX)
+    if refresh or not path.exists():
+        context.export_metadata(INDEX)
+    with open(path) as fh:
+        index = json.load(fh)
+    index.update(data)
+    with open(path, "w") as fh:
+        json.dump(index, fh)
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import re
+from email.utils import formatdate
+from pathlib import Path
+from typing import Any
+
+import requests
+from zavod import Zavod
+
+CHUNK_SIZE = 1024 * 1024
+CONCURRENCY = 4
+TIMEOUT = 60
+
+
+class FetchError(Exception):
+    pass
+
+
+def get_meta_path(path: Path) -> Path:
+    return path.with_name(path.name + ".meta.json")
+
+
+def get_part_path(path: Path) -> Path:
+    return path.with_name(path.name + ".part")
+
+
+def load_meta(path: Path) -> dict[str, Any]:
+    meta_path = get_meta_path(path)
+    if meta_path.exists():
+        with open(meta_path) as fh:
+            return json.load(fh)
+    return {}
+
+
+def dump_meta(path: Path, meta: dict[str, Any]):
+    with open(get_meta_path(path), "w") as fh:
+        json.dump(meta, fh)
+
+
+def get_expected_size(res: requests.Response) -> int | None:
+    content_range = res.headers.get("Content-Range")
+    if content_range is not None:
+        m = re.match(r"bytes\s+\d+-\d+/(\d+)", content_range)
+        if m is not None:
+            return int(m.group(1))
+        return None
+    length = res.headers.get("Content-Length")
+    if length is not None and "Content-Encoding" not in res.headers:
+        return int(length)
+
+
+def get_range_start(res: requests.Response) -> int | None:
+    m = re.match(r"bytes\s+(\d+)-", res.headers.get("Content-Range", ""))
+    if m is not None:
+        return int(m.group(1))
+
+
+def get_request_headers(path: Path, meta: dict[str, Any]) -> dict[str, str]:
+    headers = {}
+    validator = meta.get("etag") or meta.get("last_modified")
+    if meta.get("complete") and path.exists():
+        # conditional request for an already downloaded file
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        elif not meta.get("etag"):
+            headers["If-Modified-Since"] = formatdate(path.stat().st_mtime, usegmt=True)
+        return headers
+    part = get_part_path(path)
+    if validator and part.exists() and part.stat().st_size:
+        # resume an interrupted transfer of the same remote version
+        headers["Range"] = "bytes=%d-" % part.stat().st_size
+        headers["If-Range"] = validator
+    return headers
+
+
+def fetch_file(
+    context: Zavod,
+    url: str,
+    path: Path,
+    session: requests.Session | None = None,
+    timeout: int = TIMEOUT,
+) -> bool:
+    """
+    Download `url` to `path` unless the remote file didn't change since the
+    last download. Data is streamed into `<path>.part` and only moved into
+    place after its size is verified, an interrupted transfer is resumed via a
+    Range request on the next call. Returns whether the file was (re)fetched.
+    """
+    session = session or requests.Session()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    part = get_part_path(path)
+    meta = load_meta(path)
+    if meta.get("url") != url:
+        meta = {}
+    headers = get_request_headers(path, meta)
+
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as res:
+        if res.status_code == 304:
+            context.log.info("Not modified: %s" % url, fp=path.name)
+            return False
+        if res.status_code == 416:
+            # stale partial file, start over on the next run
+            part.unlink(missing_ok=True)
+            raise FetchError("Range not satisfiable for `%s`" % url)
+        res.raise_for_status()
+        if res.status_code == 206:
+            if get_range_start(res) != part.stat().st_size:
+                part.unlink(missing_ok=True)
+                raise FetchError("Unexpected Content-Range for `%s`" % url)
+            mode = "ab"
+            context.log.info(
+                "Resuming download: %s" % url, fp=path.name, offset=part.stat().st_size
+            )
+        else:
+            mode = "wb"
+            meta = {
+                "url": url,
+                "etag": res.headers.get("ETag"),
+                "last_modified": res.headers.get("Last-Modified"),
+                "complete": False,
+            }
+            context.log.info("Downloading: %s" % url, fp=path.name)
+        meta["size"] = get_expected_size(res)
+        dump_meta(path, meta)
+        with open(part, mode) as fh:
+            for chunk in res.iter_content(CHUNK_SIZE):
+                fh.write(chunk)
+
+    size = part.stat().st_size
+    if meta["size"] is not None and size != meta["size"]:
+        raise FetchError(
+            "Size mismatch for `%s`: %d of %d bytes" % (url, size, meta["size"])
+        )
+    part.replace(path)
+    meta["complete"] = True
+    dump_meta(path, meta)
+    context.log.info("Downloaded: %s" % url, fp=path.name, size=size)
+    return True
+
+
+async def fetch_files(
+    context: Zavod,
+    files: dict[Path, str],
+    concurrency: int = CONCURRENCY,
+    timeout: int = TIMEOUT,
+) -> dict[Path, bool | Exception]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _fetch(path: Path, url: str) -> bool:
+        async with semaphore:
+            return await asyncio.to_thread(
+                fetch_file, context, url, path, timeout=timeout
+            )
+
+    results = await asyncio.gather(
+        *(_fetch(path, url) for path, url in files.items()), return_exceptions=True
+    )
+    return dict(zip(files, results))
+
+
+def fetch_resources(
+    context: Zavod,
+    resources: dict[str, str],
+    concurrency: int = CONCURRENCY,
+    timeout: int = TIMEOUT,
+) -> dict[str, Path]:
+    """
+    Concurrently fetch a dataset's resources given as `{name: url}` into its
+    data directory, like `context.fetch_resource` does for a single one.
+    Failed downloads are logged and re-raised after all others are finished.
+    """
+    paths = {name: context.get_resource_path(name) for name in resources}
+    files = {paths[name]: url for name, url in resources.items()}
+    results = asyncio.run(fetch_files(context, files, concurrency, timeout))
+    errors = []
+    for path, result in results.items():
+        if isinstance(result, Exception):
+            context.log.error("Fetch failed: %s" % result, fp=path.name)
+            errors.append(result)
+    if errors:
+        raise FetchError("%d of %d downloads failed." % (len(errors), len(files)))
+    return paths
+
+
+def fetch_resource(context: Zavod, name: str, url: str, **kwargs) -> Path:
+    return fetch_resources(context, {name: url}, **kwargs)[name]
@@ -0,0 +1,100 @@
+import json
+import sys
+from array import array
+from functools import cached_property
+from pathlib import Path
+
+from nomenklatura.util import PathLike
+
+from common.lazy import lazy_module
+
+np = lazy_module("numpy")
+
+# edge schemata and the properties that point to the entities they connect
+EDGES = {
+    "Payment": ("payer", "beneficiary", "project"),
+    "Membership": ("member", "organization"),
+    "Ownership": ("owner", "asset"),
+    "ProjectParticipant": ("participant", "project"),
+    "UnknownLink": ("subject", "object"),
+}
+
+IDS = "graph.ids.txt"
+OFFSETS = "graph.offsets.npy"
+NEIGHBORS = "graph.edges.npy"
+
+
+def build_adjacency(entities_path: PathLike, out_dir: PathLike) -> tuple[int, int]:
+    """
+    Build a CSR (compressed sparse row) index that maps each entity to the
+    edge entities it is part of from an exported `entities.ftm.json`. Entity
+    ids are numbered in order of appearance and written one per line to
+    `graph.ids.txt`, the incident edges of entity `i` are
+    `edges[offsets[i]:offsets[i + 1]]`.
+    """
+    ids: dict[str, int] = {}
+    nodes, edges = array("I"), array("I")
+
+    def intern(value: str) -> int:
+        ix = ids.get(value)
+        if ix is None:
+            ix = ids[value] = len(ids)
+        return ix
+
+    with open(entities_path) as fh:
+        for line in fh:
+            data = json.loads(line)
+            props = EDGES.get(data["schema"])
+            if props is None:
+                continue
+            edge = intern(data["id"])
+            for prop in props:
+                for value in data["properties"].get(prop, []):
+                    nodes.append(intern(value))
+                    edges.append(edge)
+
+    nodes = np.frombuffer(nodes, dtype=np.uint32)
+    edges = np.frombuffer(edges, dtype=np.uint32)
+    offsets = np.zeros(len(ids) + 1, dtype=np.uint64)
+    np.cumsum(np.bincount(nodes, minlength=len(ids)), out=offsets[1:])
+    neighbors = edges[np.argsort(nodes, kind="stable")]
+
+    out_dir = Path(out_dir)
+    with open(out_dir / IDS, "w") as fh:
+        for value in ids:
+            fh.write(value + "\n")
+    np.save(out_dir / OFFSETS, offsets)
+    np.save(out_dir / NEIGHBORS, neighbors)
+    return len(ids), len(neighbors)
+
+
+class GraphIndex:
+    """
+    Read-only view on an adjacency index written by `build_adjacency`. The
+    arrays are memory mapped, so looking up the edges of an entity is a
+    dict lookup and one slice per hop.
+    """
+
+    def __init__(self, path: PathLike):
+        path = Path(path)
+        with open(path / IDS) as fh:
+            self.ids = [line.rstrip("\n") for line in fh]
+        self.offsets = np.load(path / OFFSETS, mmap_mode="r")
+        self.neighbors = np.load(path / NEIGHBORS, mmap_mode="r")
+
+    @cached_property
+    def positions(self) -> dict[str, int]:
+        return {value: ix for ix, value in enumerate(self.ids)}
+
+    def get_edges(self, entity_id: str) -> list[str]:
+        ix = self.positions.get(entity_id)
+        if ix is None:
+            return []
+        start, end = int(self.offsets[ix]), int(self.offsets[ix + 1])
+        return [self.ids[e] for e in self.neighbors[start:end].tolist()]
+
+
+if __name__ == "__main__":
+    entities_path, out_dir = sys.argv[1:3]
+    nodes, edges = build_adjacency(entities_path, out_dir)
+    print("Graph index: %d entities, %d incidences" % (nodes, edges))
@@ -0,0 +1,46 @@
+import importlib
+import importlib.util
+import sys
+from functools import cached_property
+from types import ModuleType
+from typing import Any
+
+
+def lazy_module(name: str) -> ModuleType:
+    """
+    Import `name` as a module whose code only runs on first attribute access,
+    so that heavy dependencies don't slow down the startup of scripts that
+    never touch them.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError("No module named '%s'" % name, name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+class lazy_function:
+    """
+    Stand-in for `from <module> import <name>` that imports the module when
+    the function is called the first time.
+    """
+
+    def __init__(self, module: str, name: str):
+        self.module = module
+        self.name = name
+
+    def __repr__(self) -> str:
+        return "<lazy_function %s.%s>" % (self.module, self.name)
+
+    @cached_property
+    def func(self) -> Any:
+        return getattr(importlib.import_module(self.module), self.name)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self.func(*args, **kwargs)
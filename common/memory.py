@@ -0,0 +1,145 @@
+import logging
+import os
+import re
+import resource
+import time
+from typing import Any, Callable, NamedTuple
+
+# rough in-memory size of one entity proxy, for consumers that count entities
+ENTITY_SIZE = 2_000
+HIGH = 0.85
+LOW = 0.70
+INTERVAL = 1.0
+
+CGROUP_LIMITS = (
+    "/sys/fs/cgroup/memory.max",
+    "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+)
+UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def get_rss() -> int:
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # peak instead of current usage, but better than nothing
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def get_container_limit() -> int | None:
+    for path in CGROUP_LIMITS:
+        try:
+            with open(path) as fh:
+                value = fh.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 2**60:
+            return int(value)
+    return None
+
+
+def parse_size(value: str) -> int:
+    m = re.match(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$", value, re.IGNORECASE)
+    if m is None:
+        raise ValueError("Invalid size: `%s`" % value)
+    return int(float(m.group(1)) * UNITS[m.group(2).upper()])
+
+
+class Consumer(NamedTuple):
+    name: str
+    usage: Callable[[], int]
+    release: Callable[[], Any]
+
+
+class MemoryGovernor:
+    """
+    Keeps the process below a memory budget shared by registered consumers
+    (caches, buffers, in-memory aggregators). Parsers call `checkpoint` in
+    their row loops, which samples the RSS at most every `interval` seconds.
+    Above `high` of the limit, consumers are released (evicted or flushed)
+    largest estimated usage first, until the estimated usage is back below
+    `low` of the limit. Releasing happens in the calling thread, so consumers
+    don't need to be thread-safe.
+    """
+
+    def __init__(
+        self,
+        limit: int | None = None,
+        high: float = HIGH,
+        low: float = LOW,
+        interval: float = INTERVAL,
+        rss: Callable[[], int] = get_rss,
+        log: Any = None,
+    ):
+        self.consumers: dict[str, Consumer] = {}
+        self.rss = rss
+        self.configure(limit, high, low, interval, log)
+
+    def configure(
+        self,
+        limit: int | None,
+        high: float = HIGH,
+        low: float = LOW,
+        interval: float = INTERVAL,
+        log: Any = None,
+    ):
+        if not 0 < low < high <= 1:
+            raise ValueError("Invalid thresholds: low=%s, high=%s" % (low, high))
+        self.limit = limit
+        self.high = high
+        self.low = low
+        self.interval = interval
+        self.log = log or logging.getLogger(__name__)
+        self.last_check = 0.0
+        self.releases = 0
+
+    def register(self, name: str, usage: Callable[[], int], release: Callable[[], Any]):
+        self.consumers[name] = Consumer(name, usage, release)
+
+    def unregister(self, name: str):
+        self.consumers.pop(name, None)
+
+    def checkpoint(self):
+        if self.limit is None:
+            return
+        now = time.monotonic()
+        if now - self.last_check < self.interval:
+            return
+        self.last_check = now
+        rss = self.rss()
+        if rss < self.limit * self.high:
+            return
+        self.release(rss)
+
+    def release(self, rss: int):
+        excess = rss - int(self.limit * self.low)
+        self.log.warning(
+            "Memory usage above budget: %d of %d MB" % (rss >> 20, self.limit >> 20)
+        )
+        consumers = sorted(
+            ((c.usage(), c) for c in self.consumers.values()),
+            key=lambda x: x[0],
+            reverse=True,
+        )
+        for usage, consumer in consumers:
+            if excess <= 0:
+                break
+            if usage <= 0:
+                continue
+            self.log.warning("Releasing `%s` (~%d MB)" % (consumer.name, usage >> 20))
+            consumer.release()
+            self.releases += 1
+            excess -= usage
+        if excess > 0:
+            self.log.warning(
+                "Could not release enough memory, ~%d MB left above budget"
+                % (excess >> 20)
+            )
+
+
+GOVERNOR = MemoryGovernor()
+
+
+def get_governor() -> MemoryGovernor:
+    return GOVERNOR
@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Generator
+
+from nomenklatura.entity import CE
+from zavod import Zavod
+
+from common.memory import ENTITY_SIZE, get_governor
+
+HIGH_WATERMARK = 10_000
+LOW_WATERMARK = 2_500
+BATCH_SIZE = 1_000
+LOG_INTERVAL = 30
+
+
+class EmitQueue:
+    """
+    Bounded queue between the parsing thread and the writer thread. Once the
+    queue holds `high` items, producers block until the writer drained it down
+    to `low` items, so a stalled sink throttles parsing in larger steps
+    instead of waking it up for every single entity.
+    """
+
+    def __init__(self, high: int = HIGH_WATERMARK, low: int = LOW_WATERMARK):
+        if not 0 <= low < high:
+            raise ValueError("Invalid watermarks: low=%d, high=%d" % (low, high))
+        self.high = high
+        self.low = low
+        self.items: deque[CE] = deque()
+        self.cond = threading.Condition()
+        self.throttled = False
+        self.closed = False
+        self.error: BaseException | None = None
+
+        # metrics
+        self.put_count = 0
+        self.max_depth = 0
+        self.throttle_count = 0
+        self.producer_wait = 0.0
+        self.consumer_wait = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self.items)
+
+    def put(self, item: CE):
+        with self.cond:
+            if len(self.items) >= self.high:
+                self.throttled = True
+                self.throttle_count += 1
+            if self.throttled:
+                start = time.monotonic()
+                while self.throttled and self.error is None:
+                    self.cond.wait()
+                self.producer_wait += time.monotonic() - start
+            if self.error is not None:
+                raise RuntimeError("Pipeline writer failed.") from self.error
+            self.items.append(item)
+            self.put_count += 1
+            self.max_depth = max(self.max_depth, len(self.items))
+            self.cond.notify_all()
+
+    def get_batch(self, size: int = BATCH_SIZE) -> list[CE]:
+        # returns an empty batch only when the queue is closed and drained
+        with self.cond:
+            start = time.monotonic()
+            while not self.items and not self.closed:
+                self.cond.wait()
+            self.consumer_wait += time.monotonic() - start
+            batch = [self.items.popleft() for _ in range(min(size, len(self.items)))]
+            if self.throttled and len(self.items) <= self.low:
+                self.throttled = False
+            self.cond.notify_all()
+            return batch
+
+    def drain(self):
+        # block until the writer emptied the queue
+        with self.cond:
+            while self.items and self.error is None:
+                self.cond.wait()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def fail(self, error: BaseException):
+        with self.cond:
+            self.error = error
+            self.cond.notify_all()
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "emitted": self.put_count,
+            "throttled": self.throttle_count,
+            "producer_wait": round(self.producer_wait, 2),
+            "writer_wait": round(self.consumer_wait, 2),
+        }
+
+
+class PipelineContext:
+    """
+    Wraps a zavod context so that `emit` only enqueues (a copy of) the entity
+    and the actual sink writes happen in a dedicated writer thread. Entities
+    are cloned because parsers sometimes keep adding to a proxy after it was
+    emitted, which must not race with the writer.
+    """
+
+    def __init__(self, context: Zavod, queue: EmitQueue):
+        self.context = context
+        self.queue = queue
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.context, name)
+
+    def emit(self, proxy: CE):
+        self.queue.put(proxy.clone())
+
+
+def write(context: Zavod, queue: EmitQueue, log_interval: int = LOG_INTERVAL):
+    last_log = time.monotonic()
+    try:
+        while True:
+            batch = queue.get_batch()
+            if not batch:
+                break
+            for proxy in batch:
+                context.emit(proxy)
+            if time.monotonic() - last_log > log_interval:
+                context.log.info("Pipeline queue", **queue.get_metrics())
+                last_log = time.monotonic()
+    except BaseException as e:
+        queue.fail(e)
+
+
+@contextmanager
+def pipeline(
+    context: Zavod,
+    high: int = HIGH_WATERMARK,
+    low: int = LOW_WATERMARK,
+    log_interval: int = LOG_INTERVAL,
+) -> Generator[PipelineContext, None, None]:
+    queue = EmitQueue(high, low)
+    writer = threading.Thread(
+        target=write, args=(context, queue, log_interval), name="ftg-writer"
+    )
+    writer.start()
+    governor = get_governor()
+    governor.register("pipeline queue", lambda: queue.depth * ENTITY_SIZE, queue.drain)
+    try:
+        yield PipelineContext(context, queue)
+    finally:
+        governor.unregister("pipeline queue")
+        queue.close()
+        writer.join()
+        context.log.info("Pipeline finished", **queue.get_metrics())
+    if queue.error is not None:
+        raise RuntimeError("Pipeline writer failed.") from queue.error
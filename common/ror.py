@@ -0,0 +1,206 @@
+import argparse
+import json
+import math
+import multiprocessing
+from array import array
+from functools import partial
+from typing import Generator, Iterable
+
+from followthemoney import model
+from followthemoney.util import make_entity_id
+from nomenklatura.entity import CE
+from nomenklatura.util import PathLike
+
+from common.lazy import lazy_function
+
+fp = lazy_function("fingerprints", "generate")
+
+NAME_PROPS = ("name", "alias", "weakAlias", "previousName")
+SCHEMATA = ("Organization",)
+BLOCK_LIMIT = 1_000
+THRESHOLD = 0.8
+BATCH_SIZE = 1_000
+
+Record = tuple[str, list[str], list[str]]  # id, names, countries
+Link = tuple[str, str, float]  # entity id, ror id, score
+
+
+def tokenize(name: str) -> tuple[str, ...]:
+    fingerprint = fp(name)
+    if fingerprint is None:
+        return ()
+    return tuple(t for t in fingerprint.split() if len(t) > 1)
+
+
+def stream_records(
+    path: PathLike, schemata: Iterable[str] = SCHEMATA
+) -> Generator[Record, None, None]:
+    schemata = set(schemata)
+    with open(path) as fh:
+        for line in fh:
+            data = json.loads(line)
+            if data["schema"] not in schemata:
+                continue
+            props = data["properties"]
+            names = [n for p in NAME_PROPS for n in props.get(p, [])]
+            if names:
+                yield data["id"], names, props.get("country", [])
+
+
+class RorIndex:
+    """
+    Blocking index over the ROR organizations: every name token is a block,
+    once per country of the organization and once without country, and only
+    the records sharing a block are scored against each other. Blocks with
+    more than `limit` records ("university", "hospital", ...) don't narrow
+    down anything and are dropped, the remaining tokens are weighted by their
+    inverse document frequency.
+    """
+
+    def __init__(self, limit: int = BLOCK_LIMIT):
+        self.limit = limit
+        self.ids: list[str] = []
+        self.names: list[tuple[tuple[str, ...], ...]] = []
+        self.blocks: dict[str, array] = {}
+        self.frequencies: dict[str, int] = {}
+
+    def add(self, ror_id: str, names: list[str], countries: list[str]):
+        ix = len(self.ids)
+        tokenized = tuple({t for t in map(tokenize, names) if t})
+        self.ids.append(ror_id)
+        self.names.append(tokenized)
+        tokens = {t for name in tokenized for t in name}
+        for token in tokens:
+            self.frequencies[token] = self.frequencies.get(token, 0) + 1
+            for country in ("", *countries):
+                key = f"{country}:{token}"
+                if key not in self.blocks:
+                    self.blocks[key] = array("I")
+                self.blocks[key].append(ix)
+
+    def finalize(self):
+        for key in [k for k, b in self.blocks.items() if len(b) > self.limit]:
+            del self.blocks[key]
+        total = len(self.ids)
+        self.weights = {t: math.log(total / f) for t, f in self.frequencies.items()}
+
+    def score(self, tokens: tuple[str, ...], other: tuple[str, ...]) -> float:
+        # weighted jaccard similarity, unknown tokens get the maximum weight
+        a, b = set(tokens), set(other)
+        default = math.log(len(self.ids) or 1)
+        union = sum(self.weights.get(t, default) for t in a | b)
+        if not union:
+            return 0
+        return sum(self.weights.get(t, default) for t in a & b) / union
+
+    def match(
+        self, names: list[str], countries: list[str], threshold: float = THRESHOLD
+    ) -> tuple[str, float] | None:
+        tokenized = {t for t in map(tokenize, names) if t}
+        candidates = set()
+        for country in countries or ("",):
+            for name in tokenized:
+                for token in name:
+                    candidates.update(self.blocks.get(f"{country}:{token}", ()))
+        best, best_score = None, threshold
+        for ix in candidates:
+            for name in tokenized:
+                for other in self.names[ix]:
+                    score = self.score(name, other)
+                    if score >= best_score:
+                        best, best_score = ix, score
+        if best is not None:
+            return self.ids[best], best_score
+
+
+INDEX: RorIndex | None = None
+
+
+def load_index(path: PathLike, limit: int = BLOCK_LIMIT) -> RorIndex:
+    index = RorIndex(limit)
+    for ror_id, names, countries in stream_records(path):
+        index.add(ror_id, names, countries)
+    index.finalize()
+    return index
+
+
+def match_batch(batch: list[Record], threshold: float) -> list[Link]:
+    links = []
+    for entity_id, names, countries in batch:
+        result = INDEX.match(names, countries, threshold)
+        if result is not None:
+            links.append((entity_id, *result))
+    return links
+
+
+def iter_batches(paths: Iterable[PathLike]) -> Generator[list[Record], None, None]:
+    batch = []
+    for path in paths:
+        for record in stream_records(path):
+            batch.append(record)
+            if len(batch) >= BATCH_SIZE:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def make_link(entity_id: str, ror_id: str, score: float) -> CE:
+    proxy = model.make_entity("UnknownLink")
+    proxy.id = f"ror-link-{make_entity_id(entity_id, ror_id)}"
+    proxy.add("subject", entity_id)
+    proxy.add("object", ror_id)
+    proxy.add("role", "same as")
+    proxy.add("summary", "matched to ROR by name (score: %.2f)" % score)
+    return proxy
+
+
+def link(
+    ror_path: PathLike,
+    out_path: PathLike,
+    paths: Iterable[PathLike],
+    threshold: float = THRESHOLD,
+    workers: int | None = None,
+    limit: int = BLOCK_LIMIT,
+) -> int:
+    """
+    Match the organizations of the exported datasets at `paths` against the
+    ROR entities at `ror_path` and write `same as` links to `out_path`. The
+    index is built once in the parent process and shared with the (forked)
+    workers.
+    """
+    global INDEX
+    INDEX = load_index(ror_path, limit)
+    print(
+        "ROR index: %d organizations, %d blocks" % (len(INDEX.ids), len(INDEX.blocks))
+    )
+    links = 0
+    ctx = multiprocessing.get_context("fork")
+    with ctx.Pool(workers) as pool, open(out_path, "w") as fh:
+        match = partial(match_batch, threshold=threshold)
+        results = pool.imap_unordered(match, iter_batches(paths))
+        for batch in results:
+            for result in batch:
+                fh.write(json.dumps(make_link(*result).to_dict()) + "\n")
+                links += 1
+    print("Wrote %d ROR links." % links)
+    return links
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Link organizations to ROR")
+    parser.add_argument("ror", help="ROR entities (ftm json)")
+    parser.add_argument("out", help="Output file for the links (ftm json)")
+    parser.add_argument("entities", nargs="+", help="Exported dataset entities")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--block-limit", type=int, default=BLOCK_LIMIT)
+    args = parser.parse_args()
+    link(
+        args.ror,
+        args.out,
+        args.entities,
+        args.threshold,
+        args.workers,
+        args.block_limit,
+    )
@@ -0,0 +1,79 @@
+import hashlib
+from typing import Any
+
+SCALE = 2**64
+
+
+def get_fraction(key: Any) -> float:
+    # stable across processes and runs, unlike the builtin `hash`
+    digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / SCALE
+
+
+def make_key(*parts: Any) -> str | None:
+    parts = [str(p).strip() for p in parts if p is not None]
+    key = "|".join(p for p in parts if p)
+    return key or None
+
+
+class Sampler:
+    """
+    Selects source records for a partial run. With `rate`, a record is kept
+    if the stable hash of its key falls below the rate, so the sample is the
+    same on every run and all records sharing a key (e.g. all payments to one
+    physician) are kept together. With `limit`, at most that many records are
+    accepted; parsers check `exhausted` to stop reading early.
+    """
+
+    def __init__(self, rate: float | None = None, limit: int | None = None):
+        self.configure(rate, limit)
+
+    def configure(self, rate: float | None = None, limit: int | None = None):
+        if rate is not None and not 0 < rate <= 1:
+            raise ValueError("Invalid sample rate: %s" % rate)
+        if limit is not None and limit < 0:
+            raise ValueError("Invalid limit: %s" % limit)
+        self.rate = rate
+        self.limit = limit
+        self.reset()
+
+    def reset(self):
+        self.accepted = 0
+        self.rejected = 0
+
+    @property
+    def active(self) -> bool:
+        return self.rate is not None or self.limit is not None
+
+    @property
+    def exhausted(self) -> bool:
+        return self.limit is not None and self.accepted >= self.limit
+
+    @property
+    def max_rows(self) -> int | None:
+        # without a rate the first `limit` rows are the sample, so readers
+        # that support it don't need to read any further
+        if self.rate is None:
+            return self.limit
+        return None
+
+    def selects(self, key: str | None) -> bool:
+        if self.rate is None:
+            return True
+        if key is None:
+            return False
+        return get_fraction(key) < self.rate
+
+    def accept(self, key: str | None) -> bool:
+        if self.exhausted or not self.selects(key):
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+
+SAMPLER = Sampler()
+
+
+def get_sampler() -> Sampler:
+    return SAMPLER
@@ -0,0 +1,196 @@
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Iterable, NamedTuple
+from zipfile import ZipFile
+
+from followthemoney.cli.util import write_entity
+from followthemoney.util import make_entity_id
+from nomenklatura.entity import CE
+from nomenklatura.util import PathLike
+from zavod import Zavod, init_context
+
+from common.memory import get_governor
+from common.sampling import get_sampler
+
+
+class UnitError(Exception):
+    pass
+
+
+class WorkUnit(NamedTuple):
+    archive: str
+    member: str
+    sheet: str | None
+    size: int
+
+    @property
+    def key(self) -> str:
+        return make_entity_id(Path(self.archive).name, self.member, self.sheet)
+
+
+class UnitResult(NamedTuple):
+    unit: WorkUnit
+    rows: int
+    seconds: float
+    error: str | None = None
+
+
+Handler = Callable[[Zavod, WorkUnit], int]
+
+
+class FragmentWriter:
+    """
+    Context wrapper for a worker process that writes the emitted entities to
+    its own fragments file, to be merged with the others by the `sort` step
+    of the dataset Makefile. Entities are tagged with the dataset as by
+    `Zavod.emit`.
+    """
+
+    def __init__(self, context: Zavod, path: PathLike):
+        self.context = context
+        self.fh = open(path, "wb")
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.context, name)
+
+    def emit(self, proxy: CE):
+        proxy.datasets.add(self.context.dataset.name)
+        write_entity(self.fh, proxy)
+
+    def close(self):
+        self.fh.close()
+
+
+def find_units(
+    paths: Iterable[PathLike],
+    suffix: str,
+    sheets: Iterable[str | None] = (None,),
+) -> list[WorkUnit]:
+    """
+    Enumerate the (archive, member, sheet) work units of the given zip
+    archives, largest members first so that the long running units don't end
+    up last in the queue.
+    """
+    units = []
+    sheets = tuple(sheets)
+    for path in paths:
+        with ZipFile(path, "r") as zf:
+            for info in zf.infolist():
+                name = info.filename
+                if name.startswith("__MACOSX") or not name.endswith(suffix):
+                    continue
+                for sheet in sheets:
+                    units.append(WorkUnit(str(path), name, sheet, info.file_size))
+    return sorted(units, key=lambda u: u.size, reverse=True)
+
+
+def get_fragments_path(context: Zavod, unit: WorkUnit) -> Path:
+    return context.get_resource_path(f"fragments.{unit.key}.json")
+
+
+def run_unit(
+    metadata: PathLike,
+    handler: Handler,
+    unit: WorkUnit,
+    fragments: PathLike,
+    memory_limit: int | None = None,
+) -> UnitResult:
+    start = time.perf_counter()
+    # pool workers are reused, a row limit applies per unit
+    get_sampler().reset()
+    # forked workers inherit the governor, but share its budget
+    governor = get_governor()
+    governor.configure(
+        memory_limit, governor.high, governor.low, governor.interval, governor.log
+    )
+    with init_context(metadata) as context:
+        writer = FragmentWriter(context, fragments)
+        try:
+            rows = handler(writer, unit)
+            return UnitResult(unit, rows, time.perf_counter() - start)
+        except Exception:
+            error = traceback.format_exc()
+            return UnitResult(unit, 0, time.perf_counter() - start, error)
+        finally:
+            writer.close()
+
+
+def log_result(context: Zavod, result: UnitResult):
+    unit = result.unit
+    if result.error is not None:
+        context.log.error(
+            "Unit failed: %s" % result.error,
+            archive=unit.archive,
+            member=unit.member,
+            sheet=unit.sheet,
+        )
+    else:
+        context.log.info(
+            "Unit done: %d rows in %.2fs" % (result.rows, result.seconds),
+            archive=unit.archive,
+            member=unit.member,
+            sheet=unit.sheet,
+        )
+
+
+def run_units(
+    context: Zavod,
+    handler: Handler,
+    units: list[WorkUnit],
+    workers: int | None = None,
+    metadata: PathLike = "metadata.yml",
+) -> list[UnitResult]:
+    """
+    Run `handler` for each work unit on a process pool. Every unit writes to
+    its own `fragments.<key>.json` in the dataset data directory, a failed
+    unit is logged and doesn't abort the others. Raises `UnitError` once all
+    units are done if any of them failed, after removing their incomplete
+    fragments. The memory budget of the governor is split evenly between the
+    workers.
+    """
+    workers = workers or os.cpu_count() or 1
+    context.log.info("Scheduling %d units on %d workers." % (len(units), workers))
+    start = time.perf_counter()
+    limit = get_governor().limit
+    if limit is not None:
+        limit = limit // workers
+    tasks = [
+        (
+            metadata,
+            handler,
+            u,
+            get_fragments_path(context, u),
+            limit,
+        )
+        for u in units
+    ]
+    results = []
+    if workers == 1:
+        for task in tasks:
+            results.append(run_unit(*task))
+            log_result(context, results[-1])
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run_unit, *task): task[2] for task in tasks}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception:
+                    error = traceback.format_exc()
+                    results.append(UnitResult(futures[future], 0, 0, error))
+                log_result(context, results[-1])
+
+    failed = sum(1 for r in results if r.error is not None)
+    context.log.info(
+        "Processed %d units (%d failed) in %.2fs."
+        % (len(results), failed, time.perf_counter() - start)
+    )
+    if failed:
+        for result in results:
+            if result.error is not None:
+                get_fragments_path(context, result.unit).unlink(missing_ok=True)
+        raise UnitError("%d of %d units failed." % (failed, len(results)))
+    return results
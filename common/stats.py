@@ -0,0 +1,77 @@
+import json
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from typing import Any
+
+from nomenklatura.util import PathLike
+from zavod import Zavod, init_context
+
+from common.digest import EntityDigest
+from common.export import ENTITIES, update_index
+
+
+class EntityStats:
+    """
+    Statistics of an entity stream that are collected in a single pass with
+    constant memory: entity counts per schema, the range of `date` values,
+    the sums of `amount` per currency and the digest of the entity set.
+    """
+
+    def __init__(self):
+        self.entities = 0
+        self.schemata: Counter[str] = Counter()
+        self.min_date: str | None = None
+        self.max_date: str | None = None
+        self.amounts: dict[str, Decimal] = {}
+        self.digest = EntityDigest()
+
+    def update(self, data: dict[str, Any]):
+        self.entities += 1
+        self.digest.update(data)
+        self.schemata[data["schema"]] += 1
+        props = data.get("properties", {})
+        for date in props.get("date", []):
+            if self.min_date is None or date < self.min_date:
+                self.min_date = date
+            if self.max_date is None or date > self.max_date:
+                self.max_date = date
+        amounts = props.get("amount")
+        if amounts:
+            currency = min(props.get("currency", [""]))
+            for amount in amounts:
+                try:
+                    value = Decimal(amount)
+                except InvalidOperation:
+                    continue
+                # "nan" and "inf" would end up as invalid json in the index
+                if not value.is_finite():
+                    continue
+                self.amounts[currency] = self.amounts.get(currency, 0) + value
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "entity_count": self.entities,
+            "schemata": dict(self.schemata.most_common()),
+            "date": {"min": self.min_date, "max": self.max_date},
+            "amounts": {c: float(round(v, 2)) for c, v in sorted(self.amounts.items())},
+        }
+
+
+def compute_stats(path: PathLike) -> EntityStats:
+    stats = EntityStats()
+    with open(path) as fh:
+        for line in fh:
+            stats.update(json.loads(line))
+    return stats
+
+
+def export_stats(context: Zavod):
+    stats = compute_stats(context.get_resource_path(ENTITIES))
+    data = {"statistics": stats.to_dict(), "digest": stats.digest.hexdigest()}
+    update_index(context, data, refresh=True)
+    context.log.info("Exported statistics for %d entities." % stats.entities)
+
+
+if __name__ == "__main__":
+    with init_context("metadata.yml") as context:
+        export_stats(context)
@@ -0,0 +1,62 @@
+from array import array
+from typing import Generator
+
+
+class UnionFind:
+    """
+    Disjoint set over string keys that are interned to consecutive ints, the
+    forest itself lives in two flat arrays (parent and rank) instead of a dict
+    per node. `find` uses path halving and `union` by rank, so merging n pairs
+    is effectively linear.
+    """
+
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+        self.keys: list[str] = []
+        self.parents = array("I")
+        self.ranks = array("B")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def intern(self, key: str) -> int:
+        ix = self.ids.get(key)
+        if ix is None:
+            ix = self.ids[key] = len(self.keys)
+            self.keys.append(key)
+            self.parents.append(ix)
+            self.ranks.append(0)
+        return ix
+
+    def find(self, ix: int) -> int:
+        parents = self.parents
+        while parents[ix] != ix:
+            parents[ix] = parents[parents[ix]]
+            ix = parents[ix]
+        return ix
+
+    def union(self, a: str, b: str):
+        ra, rb = self.find(self.intern(a)), self.find(self.intern(b))
+        if ra == rb:
+            return
+        if self.ranks[ra] < self.ranks[rb]:
+            ra, rb = rb, ra
+        self.parents[rb] = ra
+        if self.ranks[ra] == self.ranks[rb]:
+            self.ranks[ra] = min(self.ranks[ra] + 1, 255)
+
+    def canonical(self) -> Generator[tuple[str, str], None, None]:
+        """
+        Yield `(key, canonical key)` for every key that is not the canonical
+        one of its component, the canonical key being the smallest key of the
+        component so that it is stable across runs.
+        """
+        smallest: dict[int, str] = {}
+        for ix, key in enumerate(self.keys):
+            root = self.find(ix)
+            if root not in smallest or key < smallest[root]:
+                smallest[root] = key
+        for ix, key in enumerate(self.keys):
+            canonical = smallest[self.find(ix)]
+            if canonical != key:
+                yield key, canonical
@@ -0,0 +1,68 @@
+"""
+Warm worker: load the heavy dependencies and their caches once and then run
+dataset jobs back to back in the same process. Jobs are given as arguments or,
+if there are none, read line by line from stdin. A job is a dataset directory
+followed by the arguments for its `parse.py`:
+
+    python -m common.worker "datasets/uk_disclosure" "datasets/pubmed --pipeline"
+"""
+
+import importlib
+import os
+import runpy
+import shlex
+import sys
+import time
+import traceback
+from typing import Iterable
+
+WARM_MODULES = (
+    "pandas",
+    "dateparser",
+    "fingerprints",
+    "ftm_geocode.util",
+    "followthemoney",
+    "zavod",
+)
+
+
+def warm():
+    start = time.perf_counter()
+    for name in WARM_MODULES:
+        importlib.import_module(name)
+    # dateparser and fingerprints build their language data on first use
+    importlib.import_module("dateparser").parse("2020-01-01")
+    importlib.import_module("fingerprints").generate("Follow the Grant Ltd.")
+    print("Warmed up in %.2fs" % (time.perf_counter() - start))
+
+
+def run_job(path: str, args: list[str]) -> bool:
+    cwd, argv = os.getcwd(), sys.argv
+    start = time.perf_counter()
+    try:
+        os.chdir(path)
+        sys.argv = ["parse.py", *args]
+        runpy.run_path("parse.py", run_name="__main__")
+        return True
+    except (Exception, SystemExit):
+        traceback.print_exc()
+        return False
+    finally:
+        os.chdir(cwd)
+        sys.argv = argv
+        print("Job %s finished in %.2fs" % (path, time.perf_counter() - start))
+
+
+def run(jobs: Iterable[str]) -> int:
+    failed = 0
+    for job in jobs:
+        job = shlex.split(job)
+        if job and not run_job(job[0], job[1:]):
+            failed += 1
+    return failed
+
+
+if __name__ == "__main__":
+    warm()
+    failed = run(sys.argv[1:] or sys.stdin)
+    sys.exit(1 if failed else 0)
@@ -1,5 +1,12 @@
 from zavod import init_context
 
+from common.export import ENTITIES, INDEX
+from common.stats import export_stats
+
 if __name__ == "__main__":
     with init_context("metadata.yml") as context:
-        context.export_metadata("export/index.json")
+        # the entities are only parsed locally when the source is available
+        if context.get_resource_path(ENTITIES).exists():
+            export_stats(context)
+        else:
+            context.export_metadata(INDEX)
@@ -1,18 +1,30 @@
 from typing import Any
 from zipfile import ZipFile
 
-import pandas as pd
-from fingerprints import generate as fp
-from ftm_geocode.util import get_country_code, get_country_name
 from nomenklatura.entity import CE
 from zavod import Zavod, init_context
 from zavod.parse.addresses import make_address
 
+from common.cli import configure, make_parser
+from common.companies import canonical_id
+from common.lazy import lazy_function, lazy_module
+from common.memory import get_governor
+from common.sampling import get_sampler
+from common.scheduler import WorkUnit, find_units, run_units
+
+fp = lazy_function("fingerprints", "generate")
+get_country_code = lazy_function("ftm_geocode.util", "get_country_code")
+get_country_name = lazy_function("ftm_geocode.util", "get_country_name")
+pd = lazy_module("pandas")
+
 
 def make_payer(context: Zavod, data: dict[str, Any], country: str) -> CE:
     proxy = context.make("Organization")
-    proxy.id = context.make_slug(data.pop("clean_source_organization_id"))
-    proxy.add("name", data.pop("source_organisation_full_name"))
+    name = data.pop("source_organisation_full_name")
+    proxy.id = canonical_id(
+        context.make_slug(data.pop("clean_source_organization_id")), name
+    )
+    proxy.add("name", name)
     proxy.add("country", country)
 
     context.emit(proxy)
@@ -83,25 +95,48 @@ def parse_row(context: Zavod, data: dict[str, Any]):
     make_payment(context, payer, beneficiary, data)
 
 
-def parse(context: Zavod):
+def get_sample_key(data: dict[str, Any]) -> str | None:
+    # sample by beneficiary to keep their payments together
+    ident = data.get("recipient_entity_id", data.get("recipient_id"))
+    return ident or data.get("link_id") or None
+
+
+def parse_unit(context: Zavod, unit: WorkUnit) -> int:
+    context.log.info("Opening: %s in %s" % (unit.member, unit.archive))
+    governor = get_governor()
+    sampler = get_sampler()
+    with ZipFile(unit.archive, "r") as zf:
+        with zf.open(unit.member) as f:
+            ix = 0
+            df = pd.read_csv(f, dtype=str, nrows=sampler.max_rows).fillna("")
+            for ix, row in df.iterrows():
+                data = dict(row)
+                if sampler.active and not sampler.accept(get_sample_key(data)):
+                    if sampler.exhausted:
+                        break
+                    continue
+                parse_row(context, data)
+                governor.checkpoint()
+                if ix and ix % 10_000 == 0:
+                    context.log.info("Parse record %d ..." % ix)
+            if ix:
+                context.log.info("Parsed %d records." % (ix + 1), fp=unit.member)
+    return len(df)
+
+
+def parse(context: Zavod, workers: int | None = None):
     data_src = context.get_resource_path("src")
-    for data_path in data_src.glob("*.zip"):
-        with ZipFile(data_path, "r") as zf:
-            for name in zf.namelist():
-                if not name.startswith("__MACOSX") and name.endswith("csv"):
-                    context.log.info("Opening: %s in %s" % (name, data_path))
-                    with zf.open(name) as f:
-                        ix = 0
-                        df = pd.read_csv(f, dtype=str).fillna("")
-                        for ix, row in df.iterrows():
-                            parse_row(context, dict(row))
-                            if ix and ix % 10_000 == 0:
-                                context.log.info("Parse record %d ..." % ix)
-                        if ix:
-                            context.log.info("Parsed %d records." % (ix + 1), fp=name)
+    units = find_units(data_src.glob("*.zip"), "csv")
+    run_units(context, parse_unit, units, workers)
 
 
 if __name__ == "__main__":
+    parser = make_parser()
+    args = parser.parse_args()
+    if args.pipeline:
+        # units are parsed and written by the worker processes
+        parser.error("--pipeline is not supported by per-file parsing")
     with init_context("metadata.yml") as context:
         context.export_metadata("export/index.json")
-        parse(context)
+        with configure(context, args) as context:
+            parse(context, args.workers)
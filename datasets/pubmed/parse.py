@@ -1,28 +1,38 @@
-import csv
-import gzip
-import io
-from typing import Generator
-
-from followthegrant.model import ParsedResult
+from followthegrant.model import Article, ParsedResult
 from followthegrant.transform import make_proxies
 from nomenklatura.entity import CE
 from zavod import Zavod, init_context
 
+from common.articles import ArticleIndex, Work, stream_ids, stream_journals
+from common.cli import configure, make_parser
+from common.fetch import fetch_resources
+from common.memory import get_governor
+from common.sampling import get_sampler
+
 URL = "https://ftp.ncbi.nlm.nih.gov/pub/pmc/PMC-ids.csv.gz"
-Row = dict[str, str]
+EUROPEPMC_URL = "https://europepmc.org/pub/databases/pmc/DOI/PMID_PMCID_DOI.csv.gz"
 
+# identifiers from earlier sources take precedence when merging, PMC-ids also
+# has the journal and publication year
+SOURCES = (
+    ("PMC-ids.csv.gz", URL, stream_journals),
+    ("PMID_PMCID_DOI.csv.gz", EUROPEPMC_URL, stream_ids),
+)
 
-def make_article(context: Zavod, row: Row) -> CE:
+
+def make_article(context: Zavod, work: Work) -> CE:
+    if work.journal is None:
+        article = Article(pmid=work.pmid, pmc=work.pmc, doi=work.doi)
+        context.emit(article.proxy)
+        return
+    name, issn, eissn = work.journal
     result = {
-        "journal": {
-            "name": row.pop("Journal Title"),
-            "issn": [row.pop("ISSN"), row.pop("eISSN")],
-        },
+        "journal": {"name": name, "issn": [issn, eissn]},
         "article": {
-            "date": row.pop("Year"),
-            "doi": row.pop("DOI"),
-            "pmc": row.pop("PMCID"),
-            "pmid": row.pop("PMID"),
+            "date": work.year,
+            "doi": work.doi,
+            "pmc": work.pmc,
+            "pmid": work.pmid,
         },
     }
     result = ParsedResult(**result)
@@ -30,28 +40,35 @@ def make_article(context: Zavod, row: Row) -> CE:
         context.emit(proxy)
 
 
-def stream_csv(stream: csv.reader) -> Generator[Row, None, None]:
-    # omit header: PMID,PMCID,DOI
-    header = next(stream)
-    for row in stream:
-        yield dict(zip(header, row))
-
-
 def parse(context: Zavod):
-    data_path = context.fetch_resource("PMC-ids.csv.gz", URL)
-    with gzip.open(data_path) as zf:
-        with io.TextIOWrapper(zf) as f:
-            ix = 0
-            reader = csv.reader(f)
-            for ix, row in enumerate(stream_csv(reader)):
-                make_article(context, row)
-                if ix and ix % 10_000 == 0:
-                    context.log.info("Parse row %d ..." % ix)
-            if ix:
-                context.log.info("Parsed %d rows." % (ix + 1), fp=data_path)
+    index = ArticleIndex()
+    paths = fetch_resources(context, {name: url for name, url, _ in SOURCES})
+    for name, _, stream in SOURCES:
+        data_path = paths[name]
+        rows = index.add_many(stream(data_path))
+        context.log.info("Indexed %d rows." % rows, fp=data_path)
+
+    governor = get_governor()
+    sampler = get_sampler()
+    ix = 0
+    for ix, work in enumerate(index.iter_articles()):
+        # sample by the first known identifier of the merged article
+        key = work.pmid or work.pmc or work.doi
+        if sampler.active and not sampler.accept(key):
+            if sampler.exhausted:
+                break
+            continue
+        make_article(context, work)
+        governor.checkpoint()
+        if ix and ix % 10_000 == 0:
+            context.log.info("Parse article %d ..." % ix)
+    if ix:
+        context.log.info("Parsed %d articles from %d rows." % (ix + 1, len(index)))
 
 
 if __name__ == "__main__":
+    args = make_parser().parse_args()
     with init_context("metadata.yml") as context:
         context.export_metadata("export/index.json")
-        parse(context)
+        with configure(context, args) as context:
+            parse(context)
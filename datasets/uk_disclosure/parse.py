@@ -1,14 +1,22 @@
 from typing import Any
 from zipfile import ZipFile
 
-import pandas as pd
-from fingerprints import generate as fp
 from followthemoney.util import join_text, make_entity_id
-from ftm_geocode.util import get_country_code
 from nomenklatura.entity import CE
 from zavod import Zavod, init_context
 from zavod.parse.addresses import make_address as zavod_make_address
 
+from common.cli import configure, make_parser
+from common.companies import canonical_id
+from common.lazy import lazy_function, lazy_module
+from common.memory import get_governor
+from common.sampling import get_sampler, make_key
+from common.scheduler import WorkUnit, find_units, run_units
+
+fp = lazy_function("fingerprints", "generate")
+get_country_code = lazy_function("ftm_geocode.util", "get_country_code")
+pd = lazy_module("pandas")
+
 
 def make_address(context: Zavod, data: dict[str, Any], country: str) -> CE:
     proxy = zavod_make_address(
@@ -89,7 +97,9 @@ def make_company(context: Zavod, data: dict[str, Any]) -> CE:
     proxy = context.make("Company")
     proxy.add("name", data.pop("Pharma Company Name"))
     proxy.add("country", "gb")
-    proxy.id = context.make_slug("company", fp(proxy.caption))
+    proxy.id = canonical_id(
+        context.make_slug("company", fp(proxy.caption)), proxy.caption
+    )
 
     context.emit(proxy)
     return proxy
@@ -151,37 +161,57 @@ def parse_hcp(context: Zavod, data: dict[str, Any]):
     make_payments(context, payer, beneficiary, data)
 
 
-def parse(context: Zavod):
+SHEETS = {"HCO": parse_hco, "HCP": parse_hcp}
+
+
+def get_sample_key(data: dict[str, Any]) -> str | None:
+    # sample by beneficiary to keep their payments together
+    return make_key(
+        data.get("Institution Name"), data.get("First Name"), data.get("Last Name")
+    )
+
+
+def parse_unit(context: Zavod, unit: WorkUnit) -> int:
+    context.log.info("Opening: %s in %s" % (unit.member, unit.archive))
+    handler = SHEETS[unit.sheet]
+    governor = get_governor()
+    sampler = get_sampler()
+    with ZipFile(unit.archive, "r") as zf:
+        with zf.open(unit.member) as f:
+            ix = 0
+            df = pd.read_excel(
+                f, sheet_name=unit.sheet, skiprows=1, nrows=sampler.max_rows
+            ).fillna("")
+            for ix, row in df.iterrows():
+                data = dict(row)
+                if sampler.active and not sampler.accept(get_sample_key(data)):
+                    if sampler.exhausted:
+                        break
+                    continue
+                handler(context, data)
+                governor.checkpoint()
+                if ix and ix % 10_000 == 0:
+                    context.log.info("Parse %s record %d ..." % (unit.sheet, ix))
+            if ix:
+                context.log.info(
+                    "Parsed %d %s records." % (ix + 1, unit.sheet), fp=unit.member
+                )
+    return len(df)
+
+
+def parse(context: Zavod, workers: int | None = None):
     data_src = context.get_resource_path("src")
-    for data_path in data_src.glob("*.zip"):
-        with ZipFile(data_path, "r") as zf:
-            for name in zf.namelist():
-                if name.endswith("xlsx"):
-                    context.log.info("Opening: %s in %s" % (name, data_path))
-                    with zf.open(name) as f:
-                        ix = 0
-                        df = pd.read_excel(f, sheet_name="HCO", skiprows=1).fillna("")
-                        for ix, row in df.iterrows():
-                            parse_hco(context, dict(row))
-                            if ix and ix % 10_000 == 0:
-                                context.log.info("Parse HCO record %d ..." % ix)
-                        if ix:
-                            context.log.info(
-                                "Parsed %d HCO records." % (ix + 1), fp=name
-                            )
-                        ix = 0
-                        df = pd.read_excel(f, sheet_name="HCP", skiprows=1).fillna("")
-                        for ix, row in df.iterrows():
-                            parse_hcp(context, dict(row))
-                            if ix and ix % 10_000 == 0:
-                                context.log.info("Parse HCP record %d ..." % ix)
-                        if ix:
-                            context.log.info(
-                                "Parsed %d HCP records." % (ix + 1), fp=name
-                            )
+    units = find_units(data_src.glob("*.zip"), "xlsx", SHEETS)
+    run_units(context, parse_unit, units, workers)
 
 
 if __name__ == "__main__":
+    parser = make_parser()
+    args = parser.parse_args()
+    if args.pipeline:
+        # units are parsed and written by the worker processes
+        parser.error("--pipeline is not supported by per-file parsing")
     with init_context("metadata.yml") as context:
         context.export_metadata("export/index.json")
-        parse(context)
+        with configure(context, args) as context:
+            parse(context, args.workers)
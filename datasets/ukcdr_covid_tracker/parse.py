@@ -1,13 +1,20 @@
 import re
 from typing import Any
 
-import pandas as pd
 import requests
-from fingerprints import generate as fp
 from followthemoney.util import make_entity_id
 from nomenklatura.entity import CE
 from zavod import Zavod, init_context
 
+from common.cli import configure, make_parser
+from common.fetch import fetch_resource
+from common.lazy import lazy_function, lazy_module
+from common.memory import get_governor
+from common.sampling import get_sampler, make_key
+
+fp = lazy_function("fingerprints", "generate")
+pd = lazy_module("pandas")
+
 URL = "https://www.ukcdr.org.uk/covid-circle/covid-19-research-project-tracker/"
 FILE_URL = r".*(\/wp-content\/uploads/\d{4}\/\d{2}\/COVID-19-Research-Project-Tracker.*\.xlsx).*"
 
@@ -150,13 +157,23 @@ def parse(context: Zavod):
     res = requests.get(URL)
     url = re.search(FILE_URL, res.text).groups()[0]
     url = "https://www.ukcdr.org.uk" + url
-    data_path = context.fetch_resource("ukcdr_projects.xlsx", url)
+    data_path = fetch_resource(context, "ukcdr_projects.xlsx", url)
     df = pd.read_excel(data_path, "Funded Research Projects")
     df = df.rename(columns={c: str(c).strip() for c in df.columns})
     df = df.applymap(clean)
+    governor = get_governor()
+    sampler = get_sampler()
     ix = 0
     for ix, row in df.iterrows():
+        # reference numbers can be read as ints from the sheet
+        key = make_key(row["Funder Project ID/Reference Number"])
+        key = key or make_key(row["Unique database reference number"])
+        if sampler.active and not sampler.accept(key):
+            if sampler.exhausted:
+                break
+            continue
         parse_row(context, row)
+        governor.checkpoint()
         if ix and ix % 1_000 == 0:
             context.log.info("Parse row %d ..." % ix)
     if ix:
@@ -164,6 +181,8 @@ def parse(context: Zavod):
 
 
 if __name__ == "__main__":
+    args = make_parser().parse_args()
     with init_context("metadata.yml") as context:
         context.export_metadata("export/index.json")
-        parse(context)
+        with configure(context, args) as context:
+            parse(context)
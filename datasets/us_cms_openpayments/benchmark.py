@@ -0,0 +1,168 @@
+"""
+Measure the throughput of `ResearchParser` on synthetic RSRCH rows generated
+from the published file layout, and compare its investigator fan-out (column
+groups resolved once from the header) with the per-row column scan of the
+previous handler. The full handler is dominated by date parsing:
+
+    python benchmark.py --rows 5000
+"""
+
+import argparse
+import time
+from typing import Any
+
+from zavod import Zavod, init_context
+
+from parse import Data, ResearchParser, get_columns, get_investigator_columns
+
+PROJECTS = 200
+
+
+class NullContext:
+    # measure parsing, not writing
+    def __init__(self, context: Zavod):
+        self.context = context
+        self.emitted = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.context, name)
+
+    def emit(self, proxy):
+        self.emitted += 1
+
+
+def get_person_columns(prefix: str, location: str, street: str) -> list[str]:
+    columns = [f"{prefix}_{c}" for c in ("NPI", "First_Name", "Middle_Name")]
+    columns += [f"{prefix}_{c}" for c in ("Last_Name", "Name_Suffix")]
+    columns += [f"{street}_Street_Address_Line{i}" for i in (1, 2)]
+    columns += [
+        f"{location}_{c}"
+        for c in ("City", "State", "Zip_Code", "Country", "Province", "Postal_Code")
+    ]
+    columns += [f"{prefix}_Primary_Type_{i}" for i in range(1, 7)]
+    columns += [f"{prefix}_Specialty_{i}" for i in range(1, 7)]
+    columns += [f"{prefix}_License_State_code{i}" for i in range(1, 6)]
+    return columns
+
+
+def make_header() -> list[str]:
+    header = ["Change_Type", "Covered_Recipient_Type"]
+    header += ["Noncovered_Recipient_Entity_Name", "Teaching_Hospital_CCN"]
+    header += ["Teaching_Hospital_ID", "Teaching_Hospital_Name"]
+    header += ["Covered_Recipient_Profile_ID"]
+    header += get_person_columns(
+        "Covered_Recipient", "Recipient", "Recipient_Primary_Business"
+    )
+    for i in range(1, 6):
+        prefix = f"Principal_Investigator_{i}"
+        header.append(f"{prefix}_Profile_ID")
+        header += get_person_columns(prefix, prefix, f"{prefix}_Business")
+    gpo = "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment"
+    header += ["Submitting_Applicable_Manufacturer_or_Applicable_GPO_Name"]
+    header += [f"{gpo}_{c}" for c in ("ID", "Name", "State", "Country")]
+    header += ["Related_Product_Indicator"]
+    for i in range(1, 6):
+        header += [
+            f"Covered_or_Noncovered_Indicator_{i}",
+            f"Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_{i}",
+            f"Product_Category_or_Therapeutic_Area_{i}",
+            f"Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_{i}",
+            f"Associated_Drug_or_Biological_NDC_{i}",
+            f"Associated_Device_or_Medical_Supply_PDI_{i}",
+        ]
+    header += ["Total_Amount_of_Payment_USDollars", "Date_of_Payment"]
+    header += ["Form_of_Payment_or_Transfer_of_Value"]
+    header += [f"Expenditure_Category{i}" for i in range(1, 7)]
+    header += ["Preclinical_Research_Indicator", "Delay_in_Publication_Indicator"]
+    header += ["Name_of_Study", "Dispute_Status_for_Publication", "Record_ID"]
+    header += ["Program_Year", "Payment_Publication_Date"]
+    header += ["ClinicalTrials_Gov_Identifier", "Research_Information_Link"]
+    header += ["Context_of_Research"]
+    return header
+
+
+def make_row(header: list[str], ix: int) -> list[str]:
+    values = {
+        "Covered_Recipient_Type": "Covered Recipient Physician",
+        "Covered_Recipient_Profile_ID": str(100_000 + ix % 5_000),
+        "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_ID": str(ix % 50),
+        "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Name": "Pharma %d"
+        % (ix % 50),
+        "Name_of_Study": "Study %d" % (ix % PROJECTS),
+        "ClinicalTrials_Gov_Identifier": "NCT%08d" % (ix % PROJECTS),
+        "Record_ID": str(ix),
+        "Program_Year": "2021",
+        "Date_of_Payment": "2021-03-%02d" % (ix % 28 + 1),
+        "Total_Amount_of_Payment_USDollars": "%d.50" % ix,
+    }
+    row = []
+    for column in header:
+        if column in values:
+            row.append(values[column])
+        elif column.endswith("_Profile_ID"):
+            # 3 of 5 investigators are set
+            i = int(column.split("_")[2])
+            row.append(str(200_000 + ix % 7_000 + i) if i <= 3 else "")
+        elif column.endswith("Country"):
+            row.append("United States")
+        elif column.endswith(("First_Name", "Last_Name", "City")):
+            row.append("%s %d" % (column.rsplit("_", 1)[0][-6:], ix % 1_000))
+        else:
+            row.append("")
+    return row
+
+
+def run(
+    context: NullContext, handler: ResearchParser, columns: list[str], rows: list
+) -> float:
+    start = time.perf_counter()
+    for row in rows:
+        handler(context, dict(zip(columns, row)))
+    handler.flush(context)
+    return time.perf_counter() - start
+
+
+def split_scan(data: Data) -> list[Data]:
+    # the previous handler scanned every column for each investigator
+    return [
+        {
+            k.replace(f"Principal_Investigator_{i}", "Recipient"): v
+            for k, v in data.items()
+            if k.startswith(f"Principal_Investigator_{i}")
+        }
+        for i in range(1, 6)
+    ]
+
+
+def time_split(columns: list[str], rows: list) -> tuple[float, float]:
+    # the investigator fan-out alone, without entity construction
+    investigators = [get_investigator_columns(columns, i) for i in range(1, 6)]
+    rows = [dict(zip(columns, row)) for row in rows]
+    start = time.perf_counter()
+    for data in rows:
+        split_scan(data)
+    scan = time.perf_counter() - start
+    start = time.perf_counter()
+    for data in rows:
+        [{key: data.get(c) for c, key in group} for group in investigators]
+    return scan, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5_000)
+    args = parser.parse_args()
+    header = make_header()
+    columns = get_columns(header)
+    rows = [make_row(header, ix) for ix in range(args.rows)]
+    with init_context("metadata.yml") as context:
+        # warm up lazy imports and caches
+        run(NullContext(context), ResearchParser(columns), columns, rows[:50])
+        ctx = NullContext(context)
+        seconds = run(ctx, ResearchParser(columns), columns, rows)
+        print(
+            "ResearchParser  %8.0f rows/s  %8d entities emitted"
+            % (len(rows) / seconds, ctx.emitted)
+        )
+    for name, seconds in zip(("scan", "columns"), time_split(columns, rows)):
+        print("split %-9s %8.0f rows/s" % (name, len(rows) / seconds))
@@ -0,0 +1,88 @@
+import argparse
+import csv
+import json
+import os
+
+from zavod import Zavod, init_context
+
+from common.unionfind import UnionFind
+
+ENTITIES = "export/entities.ftm.json"
+MAPPING = "export/physicians.canonical.csv"
+
+
+def get_physician_id(context: Zavod, value: str) -> str:
+    # `connect_physicians` links to the raw (numeric) profile id of the other
+    # profile, not to its entity id
+    if value.isdigit():
+        return context.make_slug("physician", value)
+    return value
+
+
+def load_profiles(context: Zavod) -> UnionFind:
+    profiles = UnionFind()
+    pairs = 0
+    with open(context.get_resource_path(ENTITIES)) as fh:
+        for line in fh:
+            data = json.loads(line)
+            if data["schema"] != "UnknownLink":
+                continue
+            props = data["properties"]
+            if "same as" not in props.get("role", []):
+                continue
+            for subject in props.get("subject", []):
+                for other in props.get("object", []):
+                    profiles.union(subject, get_physician_id(context, other))
+                    pairs += 1
+    context.log.info("Merged %d profile pairs of %d profiles." % (pairs, len(profiles)))
+    return profiles
+
+
+def rewrite_payments(context: Zavod, mapping: dict[str, str]):
+    path = context.get_resource_path(ENTITIES)
+    tmp_path = path.with_name(path.name + ".tmp")
+    rewritten = 0
+    with open(path) as fh, open(tmp_path, "w") as out:
+        for line in fh:
+            if '"Payment"' in line:
+                data = json.loads(line)
+                props = data["properties"]
+                if data["schema"] == "Payment" and "beneficiary" in props:
+                    values = [mapping.get(v, v) for v in props["beneficiary"]]
+                    if values != props["beneficiary"]:
+                        props["beneficiary"] = sorted(set(values))
+                        line = json.dumps(data) + "\n"
+                        rewritten += 1
+            out.write(line)
+    os.replace(tmp_path, path)
+    context.log.info("Rewrote the beneficiary of %d payments." % rewritten)
+
+
+def consolidate(context: Zavod, rewrite: bool = False):
+    """
+    Resolve the chains of "same as" links between physician profiles into
+    connected components and publish a `profile id -> canonical id` mapping
+    for all non-canonical profiles. Optionally point payments directly to
+    the canonical profile.
+    """
+    profiles = load_profiles(context)
+    mapping = dict(profiles.canonical())
+    if rewrite:
+        rewrite_payments(context, mapping)
+    with open(context.get_resource_path(MAPPING), "w") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(("profile_id", "canonical_id"))
+        writer.writerows(sorted(mapping.items()))
+    context.log.info("Mapped %d profiles to a canonical profile." % len(mapping))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=consolidate.__doc__)
+    parser.add_argument(
+        "--rewrite",
+        action="store_true",
+        help="Rewrite `Payment.beneficiary` to the canonical profile",
+    )
+    args = parser.parse_args()
+    with init_context("metadata.yml", sink_type="ftmstore") as context:
+        consolidate(context, args.rewrite)
@@ -0,0 +1,34 @@
+import re
+from urllib.parse import urljoin
+
+import requests
+from zavod import Zavod, init_context
+
+from common.fetch import TIMEOUT, fetch_resources
+
+PAGES = (
+    "https://www.cms.gov/OpenPayments/Data/Dataset-Downloads",
+    "https://www.cms.gov/openpayments/archived-datasets",
+)
+ZIP_URL = r"href=\"([^\"]+\.zip)\""
+
+
+def get_zip_urls(context: Zavod) -> dict[str, str]:
+    urls = {}
+    for page in PAGES:
+        res = requests.get(page, timeout=TIMEOUT)
+        res.raise_for_status()
+        for url in re.findall(ZIP_URL, res.text, flags=re.IGNORECASE):
+            url = urljoin(page, url)
+            urls[f"src/{url.rsplit('/', 1)[-1]}"] = url
+    context.log.info("Found %d archives." % len(urls))
+    return urls
+
+
+def fetch(context: Zavod):
+    fetch_resources(context, get_zip_urls(context))
+
+
+if __name__ == "__main__":
+    with init_context("metadata.yml", sink_type="ftmstore") as context:
+        fetch(context)
@@ -1,19 +1,33 @@
 import csv
 import io
-import sys
-from typing import Any, Generator, Literal
+import re
+from pathlib import Path
+from typing import Any, Callable, Generator
 from zipfile import ZipFile
 
-from dateparser import parse as parse_date
-from fingerprints import generate as fp
+import yaml
 from followthemoney.util import join_text, make_entity_id
-from ftm_geocode.util import get_country_code
 from nomenklatura.entity import CE
 from zavod import Zavod, init_context
 from zavod.parse.addresses import make_address
 
+from common.cli import configure, make_parser
+from common.companies import canonical_id
+from common.lazy import lazy_function
+from common.memory import ENTITY_SIZE, get_governor
+from common.sampling import get_sampler
+
+fp = lazy_function("fingerprints", "generate")
+get_country_code = lazy_function("ftm_geocode.util", "get_country_code")
+parse_date = lazy_function("dateparser", "parse")
+
 Data = dict[str, Any]
 
+# every program year is published as its own archive, archives without a
+# program year (the physician profile supplement) form their own partition
+PROGRAM_YEAR = re.compile(r"PGYR(\d{4})", re.IGNORECASE)
+PROFILES = "profiles"
+
 COLUMNS = {
     "Recipient_Primary_Business_Street_Address_Line1": "Recipient_Address_Line_1",
     "Recipient_Primary_Business_Street_Address_Line2": "Recipient_Address_Line_2",
@@ -180,10 +194,9 @@ def make_company(context: Zavod, data: Data) -> CE | None:
     if proxy.id is None:
         return
 
-    proxy.add(
-        "name",
-        data.pop("Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Name"),
-    )
+    name = data.pop("Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Name")
+    proxy.id = canonical_id(proxy.id, name)
+    proxy.add("name", name)
     proxy.add(
         "country",
         data.pop("Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Country"),
@@ -249,7 +262,7 @@ def make_participation(
     participant: CE | None,
     data: Data,
     role: str | None = None,
-):
+) -> CE | None:
     if project is None or participant is None:
         return
 
@@ -262,8 +275,7 @@ def make_participation(
     proxy.add("role", role)
     proxy.add("date", data["Program_Year"])
     proxy.add("sourceUrl", data["Research_Information_Link"])
-
-    context.emit(proxy)
+    return proxy
 
 
 def make_payment(
@@ -299,76 +311,121 @@ def make_payment(
     context.emit(proxy)
 
 
-def parse_research(context: Zavod, data: Data):
-    project = None
-    projectName = data.pop("Name_of_Study")
-    if fp(projectName):
-        project = context.make("Project")
-        projectId = data.pop("ClinicalTrials_Gov_Identifier")
-        project.id = context.make_slug("project", projectId) or context.make_slug(
-            "project", make_entity_id(fp(projectName))
-        )
-        project.add("name", projectName)
-        project.add("projectId", projectId)
-        project.add("date", data["Program_Year"])
-        project.add("sourceUrl", data["Research_Information_Link"])
-        project.add("notes", data.pop("Context_of_Research"))
-        project.add("description", get_description(data))
-
-    recipient = make_recipient(context, data)
-    if recipient is not None:
-        if project is not None:
-            project.add("country", recipient.countries)
-
-        try:
-            for i in range(1, 6):
-                recipient.add("summary", data.pop(f"Recipient_Primary_Type_{i}"))
-                recipient.add("summary", data.pop(f"Recipient_Specialty_{i}"))
-        except KeyError:
-            recipient.add("summary", data.pop("Recipient_Primary_Type"))
-
-    for i in range(1, 6):
-        investigator_data = {
-            k.replace(f"Principal_Investigator_{i}", "Recipient"): v
-            for k, v in data.items()
-            if k.startswith(f"Principal_Investigator_{i}")
-        }
-        investigator_data["Recipient_ID"] = investigator_data.pop(
-            "Recipient_Profile_ID"
+def get_summary_columns(
+    columns: list[str], prefix: str, *fallback: str
+) -> tuple[str, ...]:
+    numbered = tuple(
+        c
+        for i in range(1, 6)
+        for c in (f"{prefix}_Primary_Type_{i}", f"{prefix}_Specialty_{i}")
+    )
+    if all(c in columns for c in numbered):
+        return numbered
+    return fallback
+
+
+def get_investigator_columns(
+    columns: list[str], ix: int
+) -> tuple[tuple[str, str], ...]:
+    prefix = f"Principal_Investigator_{ix}"
+    mapping = []
+    for c in columns:
+        if c.startswith(prefix):
+            key = c.replace(prefix, "Recipient")
+            if key == "Recipient_Profile_ID":
+                key = "Recipient_ID"
+            mapping.append((c, key))
+    return tuple(mapping)
+
+
+class ResearchParser:
+    """
+    Handler for the research payments files. The column groups for the
+    recipient and the 5 principal investigators are resolved once from the
+    header, and projects and their participations are merged across rows in
+    memory and emitted once per file via `flush`. The memory governor may
+    flush earlier, which is fine as the store merges fragments by id.
+    """
+
+    def __init__(self, columns: list[str]):
+        self.recipient_summary = get_summary_columns(
+            columns, "Recipient", "Recipient_Primary_Type"
         )
-        investigator = make_recipient_person(context, investigator_data)
-        if investigator is not None:
-            try:
-                for j in range(1, 6):
-                    investigator.add(
-                        "summary",
-                        data.pop(f"Principal_Investigator_{i}_Primary_Type_{j}"),
-                    )
-                    investigator.add(
-                        "summary", data.pop(f"Principal_Investigator_{i}_Specialty_{j}")
-                    )
-            except KeyError:
-                investigator.add(
-                    "summary",
-                    data.pop(f"Principal_Investigator_{i}_Primary_Type"),
-                )
-                investigator.add(
-                    "summary", data.pop(f"Principal_Investigator_{i}_Specialty")
+        self.investigators = []
+        for i in range(1, 6):
+            prefix = f"Principal_Investigator_{i}"
+            self.investigators.append(
+                (
+                    get_investigator_columns(columns, i),
+                    get_summary_columns(
+                        columns, prefix, f"{prefix}_Primary_Type", f"{prefix}_Specialty"
+                    ),
                 )
-            if project is not None:
-                project.add("country", investigator.countries)
-            make_participation(
-                context, project, investigator, data, "Principal investigator"
             )
+        self.entities: dict[str, CE] = {}
+
+    def add(self, proxy: CE | None):
+        if proxy is None:
+            return
+        if proxy.id in self.entities:
+            self.entities[proxy.id].merge(proxy)
+        else:
+            self.entities[proxy.id] = proxy
+
+    def flush(self, context: Zavod):
+        for proxy in self.entities.values():
+            context.emit(proxy)
+        self.entities.clear()
+
+    def memory_usage(self) -> int:
+        return len(self.entities) * ENTITY_SIZE
+
+    def __call__(self, context: Zavod, data: Data):
+        project = None
+        projectName = data.pop("Name_of_Study")
+        if fp(projectName):
+            project = context.make("Project")
+            projectId = data.pop("ClinicalTrials_Gov_Identifier")
+            project.id = context.make_slug("project", projectId) or context.make_slug(
+                "project", make_entity_id(fp(projectName))
+            )
+            project.add("name", projectName)
+            project.add("projectId", projectId)
+            project.add("date", data["Program_Year"])
+            project.add("sourceUrl", data["Research_Information_Link"])
+            project.add("notes", data.pop("Context_of_Research"))
+            project.add("description", get_description(data))
+
+        recipient = make_recipient(context, data)
+        if recipient is not None:
+            if project is not None:
+                project.add("country", recipient.countries)
+            for key in self.recipient_summary:
+                recipient.add("summary", data.pop(key, None))
+
+        for columns, summary in self.investigators:
+            # rows can be shorter than the header
+            investigator_data = {key: data.get(c) for c, key in columns}
+            investigator = make_recipient_person(context, investigator_data)
+            if investigator is not None:
+                for key in summary:
+                    investigator.add("summary", data.pop(key, None))
+                if project is not None:
+                    project.add("country", investigator.countries)
+                self.add(
+                    make_participation(
+                        context, project, investigator, data, "Principal investigator"
+                    )
+                )
 
-    company = make_company(context, data)
-
-    make_participation(context, project, company, data, "Financier")
-    make_participation(context, project, recipient, data)
-    make_payment(context, data, payer=company, beneficiary=recipient, project=project)
+        company = make_company(context, data)
 
-    if project is not None:
-        context.emit(project)
+        self.add(make_participation(context, project, company, data, "Financier"))
+        self.add(make_participation(context, project, recipient, data))
+        make_payment(
+            context, data, payer=company, beneficiary=recipient, project=project
+        )
+        self.add(project)
 
 
 def parse_general(context: Zavod, data: Data):
@@ -377,22 +434,39 @@ def parse_general(context: Zavod, data: Data):
     make_payment(context, data, payer=company, beneficiary=recipient)
 
 
+Handler = Callable[[Zavod, Data], None]
+
 HANDLERS = {
     "PRFL_SPLMTL": parse_physician,
     "OWNRSHP": parse_ownership,
-    "RSRCH": parse_research,
+    "RSRCH": ResearchParser,
     "GNRL": parse_general,
 }
 
 
-def get_handler(fname: str) -> Literal[parse_physician] | None:
+# records are sampled by recipient, so that a sample keeps complete profiles
+SAMPLE_KEYS = ("Recipient_ID", "Teaching_Hospital_ID", "Record_ID")
+
+
+def get_sample_key(data: Data) -> str | None:
+    for key in SAMPLE_KEYS:
+        if data.get(key):
+            return data[key]
+
+
+def has_handler(fname: str) -> bool:
+    return any(key in fname for key in HANDLERS)
+
+
+def get_handler(fname: str, columns: list[str]) -> Handler | None:
     for key, handler in HANDLERS.items():
         if key in fname:
+            if isinstance(handler, type):
+                return handler(columns)
             return handler
 
 
-def stream_csv(stream: csv.reader) -> Generator[Data, None, None]:
-    header = next(stream)
+def get_columns(header: list[str]) -> list[str]:
     columns = []
     for c in header:
         seen = False
@@ -403,44 +477,110 @@ def stream_csv(stream: csv.reader) -> Generator[Data, None, None]:
                 break
         if not seen:
             columns.append(c)
+    return columns
+
 
+def stream_csv(stream: csv.reader, columns: list[str]) -> Generator[Data, None, None]:
     for row in stream:
         yield dict(zip(columns, row))
 
 
-def parse(context: Zavod, prefix: str | None = None):
+def get_partition(path: Path) -> str:
+    m = PROGRAM_YEAR.search(path.name)
+    if m is None:
+        return PROFILES
+    return m.group(1)
+
+
+def make_metadata(partition: str, path: str = "metadata.yml") -> Path:
+    """
+    Derive the metadata of a partition, so that it is parsed into its own
+    store dataset and can be processed independently of the others.
+    """
+    with open(path) as fh:
+        metadata = yaml.safe_load(fh)
+    metadata["name"] = f"{metadata['name']}_{partition}"
+    metadata["title"] = f"{metadata['title']} ({partition})"
+    for resource in metadata.get("resources", []):
+        base, name = resource["url"].rsplit("/", 1)
+        resource["url"] = f"{base}/{partition}/{name}"
+    out_path = Path(path).with_name(f"metadata.{partition}.yml")
+    with open(out_path, "w") as fh:
+        yaml.safe_dump(metadata, fh, sort_keys=False)
+    return out_path
+
+
+def parse(context: Zavod, prefix: str | None = None, year: str | None = None):
+    governor = get_governor()
+    sampler = get_sampler()
     data_src = context.get_resource_path("src")
-    for data_path in data_src.glob("*.ZIP"):
+    # the same archives the Makefile derives the program years from
+    data_paths = sorted(p for p in data_src.iterdir() if p.suffix.lower() == ".zip")
+    if year is not None:
+        data_paths = [p for p in data_paths if get_partition(p) == year]
+        if not data_paths and year != PROFILES:
+            raise ValueError("No archives for program year: %s" % year)
+    for data_path in data_paths:
         if prefix is not None and not data_path.name.startswith(prefix):
             continue
+        if sampler.exhausted:
+            break
 
         with ZipFile(data_path, "r") as zf:
             for name in zf.namelist():
+                if sampler.exhausted:
+                    break
                 if name.endswith("csv"):
-                    context.log.info("Opening: %s in %s" % (name, data_path))
-                    handler = get_handler(name)
-                    if handler is None:
+                    # check the name first to not decompress unhandled members
+                    if not has_handler(name):
                         context.log.warning(f"No handler for file `{name}`")
                         continue
-
                     with zf.open(name) as fh:
                         with io.TextIOWrapper(fh) as f:
-                            ix = 0
                             reader = csv.reader(f)
-                            for ix, row in enumerate(stream_csv(reader)):
+                            columns = get_columns(next(reader))
+                            handler = get_handler(name, columns)
+                            context.log.info("Opening: %s in %s" % (name, data_path))
+                            if isinstance(handler, ResearchParser):
+                                governor.register(
+                                    "research projects",
+                                    handler.memory_usage,
+                                    lambda: handler.flush(context),
+                                )
+                            ix = 0
+                            for ix, row in enumerate(stream_csv(reader, columns)):
+                                if sampler.active:
+                                    if not sampler.accept(get_sample_key(row)):
+                                        if sampler.exhausted:
+                                            break
+                                        continue
                                 handler(context, row)
+                                governor.checkpoint()
                                 if ix and ix % 10_000 == 0:
                                     context.log.info("Parse record %d ..." % ix)
                             if ix:
                                 context.log.info(
                                     "Parsed %d records." % (ix + 1), fp=name
                                 )
+                            if isinstance(handler, ResearchParser):
+                                handler.flush(context)
+                                governor.unregister("research projects")
 
 
 if __name__ == "__main__":
-    with init_context("metadata.yml", sink_type="ftmstore") as context:
-        prefix = None
-        if len(sys.argv) > 1:
-            prefix = sys.argv[1]
-        context.export_metadata("export/index.json")
-        parse(context, prefix)
+    parser = make_parser()
+    parser.add_argument(
+        "prefix", nargs="?", help="Only parse archives with this prefix"
+    )
+    parser.add_argument(
+        "--year",
+        help=f"Only parse one program year (or `{PROFILES}`) into its own dataset",
+    )
+    args = parser.parse_args()
+    metadata, index = "metadata.yml", "export/index.json"
+    if args.year is not None:
+        metadata, index = make_metadata(args.year), f"export/{args.year}/index.json"
+    with init_context(metadata, sink_type="ftmstore") as context:
+        context.export_metadata(index)
+        with configure(context, args) as context:
+            parse(context, args.prefix, args.year)
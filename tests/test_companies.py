@@ -0,0 +1,54 @@
+import csv
+import json
+
+from common.companies import CompanyIndex, build_index
+
+
+def write_export(path, *companies: tuple[str, str]):
+    # one payment per payer, as in the exported datasets
+    with open(path, "w") as fh:
+        for ix, (entity_id, name) in enumerate(companies):
+            company = {
+                "id": entity_id,
+                "schema": "Company",
+                "properties": {"name": [name]},
+            }
+            payment = {
+                "id": f"payment-{ix}",
+                "schema": "Payment",
+                "properties": {"payer": [entity_id]},
+            }
+            fh.write(json.dumps(company) + "\n")
+            fh.write(json.dumps(payment) + "\n")
+
+
+def read_index(path) -> dict[str, str]:
+    with open(path) as fh:
+        return dict(csv.reader(fh))
+
+
+def test_build_index(tmp_path):
+    export, index = tmp_path / "a.ftm.json", tmp_path / "companies.csv"
+    write_export(export, ("a-1", "Pfizer Inc."), ("b-1", "PFIZER INC"))
+    assert build_index([export], index) == 3
+    mapping = read_index(index)
+    assert mapping["id:a-1"] == mapping["id:b-1"]
+    assert CompanyIndex.load(index).get("b-1") == mapping["id:a-1"]
+
+
+def test_rebuild_keeps_ids(tmp_path):
+    export, index = tmp_path / "a.ftm.json", tmp_path / "companies.csv"
+    write_export(export, ("a-1", "Pfizer Inc."), ("a-2", "Bayer AG"))
+    build_index([export], index)
+    first = read_index(index)
+    pfizer, bayer = first["id:a-1"], first["id:a-2"]
+
+    # the next export only has the canonical ids, and a new name variant
+    write_export(export, (pfizer, "Pfizer Inc."), (bayer, "Bayer Aktiengesellschaft"))
+    build_index([export], index, seed=index)
+    second = read_index(index)
+    assert second["id:a-1"] == pfizer
+    assert second["id:a-2"] == bayer
+    assert set(second.values()) == {pfizer, bayer}
+    assert set(first.items()) <= set(second.items())
+    assert not any(k.startswith(("canonical:", f"id:{pfizer}")) for k in second)
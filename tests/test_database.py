@@ -0,0 +1,42 @@
+import json
+import sqlite3
+
+from common.database import build_database, get_value
+
+PAYMENT = {
+    "id": "payment-1",
+    "schema": "Payment",
+    "properties": {
+        "payer": ["company-1", "company-2"],
+        "beneficiary": ["person-1", "person-2"],
+        "amount": ["99", "100"],
+        "currency": ["USD"],
+    },
+}
+
+
+def test_numeric_value():
+    assert get_value(PAYMENT["properties"], "amount") == 99.0
+    assert get_value({"amount": ["n/a", "1e3"]}, "amount") == 1000.0
+    assert get_value({"amount": ["n/a"]}, "amount") is None
+    assert get_value(PAYMENT["properties"], "payer") == "company-1"
+
+
+def test_multi_valued_edges(tmp_path):
+    entities = tmp_path / "entities.ftm.json"
+    entities.write_text(json.dumps(PAYMENT) + "\n")
+    path = tmp_path / "entities.sqlite"
+    counts = build_database(entities, path)
+    assert counts["payments"] == 1
+    assert counts["links"] == 4
+    conn = sqlite3.connect(path)
+    row = conn.execute("SELECT payer, beneficiary, SUM(amount) FROM payments")
+    assert row.fetchone() == ("company-1", "person-1", 99.0)
+    links = conn.execute("SELECT prop, entity FROM links ORDER BY prop, entity")
+    assert links.fetchall() == [
+        ("beneficiary", "person-1"),
+        ("beneficiary", "person-2"),
+        ("payer", "company-1"),
+        ("payer", "company-2"),
+    ]
+    conn.close()
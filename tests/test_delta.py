@@ -0,0 +1,63 @@
+import json
+
+from common.delta import Row, diff, write_delta, write_manifest
+
+
+def rows(*items: tuple[str, str]) -> list[Row]:
+    return [Row(entity_id, entity_hash, 0) for entity_id, entity_hash in items]
+
+
+def run_diff(previous: list[Row], current: list[Row]) -> list[tuple[str, str]]:
+    return [(op, row.id) for op, row in diff(iter(previous), iter(current))]
+
+
+def test_both_empty():
+    assert run_diff([], []) == []
+
+
+def test_one_side_exhausted():
+    entities = rows(("a", "1"), ("b", "1"), ("c", "1"))
+    assert run_diff([], entities) == [("added", "a"), ("added", "b"), ("added", "c")]
+    assert run_diff(entities, []) == [
+        ("removed", "a"),
+        ("removed", "b"),
+        ("removed", "c"),
+    ]
+    # the tail of the longer side after the other one ran out
+    assert run_diff(entities[:1], entities) == [("added", "b"), ("added", "c")]
+    assert run_diff(entities, entities[2:]) == [("removed", "a"), ("removed", "b")]
+
+
+def test_changed():
+    previous = rows(("a", "1"), ("b", "1"), ("d", "1"))
+    current = rows(("a", "1"), ("b", "2"), ("c", "1"))
+    assert run_diff(previous, current) == [
+        ("changed", "b"),
+        ("added", "c"),
+        ("removed", "d"),
+    ]
+
+
+def write_entities(path, *entities: tuple[str, str]):
+    with open(path, "w") as fh:
+        for entity_id, name in entities:
+            data = {"id": entity_id, "schema": "Person", "properties": {"name": [name]}}
+            fh.write(json.dumps(data) + "\n")
+
+
+def test_write_delta(tmp_path):
+    previous, current = tmp_path / "previous.json", tmp_path / "current.json"
+    write_entities(previous, ("b", "Bob"), ("a", "Alice"))
+    write_entities(current, ("c", "Carol"), ("a", "Alicia"))
+    write_manifest(previous, tmp_path / "previous.tsv")
+    write_manifest(current, tmp_path / "current.tsv")
+    out_dir = tmp_path / "delta"
+    counts = write_delta(
+        current, tmp_path / "previous.tsv", tmp_path / "current.tsv", out_dir
+    )
+    assert counts == {"added": 1, "changed": 1, "removed": 1}
+    added = json.loads((out_dir / "added.ftm.json").read_text())
+    changed = json.loads((out_dir / "changed.ftm.json").read_text())
+    assert added["properties"]["name"] == ["Carol"]
+    assert changed["properties"]["name"] == ["Alicia"]
+    assert (out_dir / "removed.txt").read_text() == "b\n"
@@ -0,0 +1,59 @@
+import json
+
+from common.digest import EntityDigest, compare
+
+ENTITIES = [
+    {"id": "a", "schema": "Person", "properties": {"name": ["Alice", "Ali"]}},
+    {"id": "b", "schema": "Company", "properties": {"name": ["Bayer AG"]}},
+]
+
+
+def make_index(**data) -> dict:
+    index = {
+        "name": "test",
+        "title": "Test",
+        "updated_at": "2024-01-01T00:00:00",
+        "digest": "sha256-sum:00",
+        "resources": [{"name": "entities.ftm.json", "url": "x", "size": 10}],
+    }
+    index.update(data)
+    return index
+
+
+def write_index(path, index: dict) -> str:
+    path.write_text(json.dumps(index))
+    return str(path)
+
+
+def test_digest_order():
+    first, second = EntityDigest(), EntityDigest()
+    for data in ENTITIES:
+        first.update(data)
+    for data in reversed(ENTITIES):
+        data = dict(data, properties={"name": data["properties"]["name"][::-1]})
+        second.update(data)
+    assert first.hexdigest() == second.hexdigest()
+    assert first.entities == 2
+
+
+def test_compare(tmp_path):
+    published = write_index(tmp_path / "published.json", make_index())
+    # run dependent keys don't count
+    local = make_index(
+        updated_at="2024-02-01T00:00:00",
+        statistics={"entity_count": 2},
+        resources=[{"name": "entities.ftm.json", "url": "x", "size": 12}],
+    )
+    assert compare(write_index(tmp_path / "local.json", local), published)
+    assert not compare(str(tmp_path / "missing.json"), published)
+
+
+def test_compare_metadata(tmp_path):
+    published = write_index(tmp_path / "published.json", make_index())
+    local = write_index(tmp_path / "local.json", make_index(title="Renamed"))
+    assert not compare(local, published)
+    resources = make_index()["resources"] + [{"name": "entities.sqlite", "url": "y"}]
+    local = write_index(tmp_path / "local.json", make_index(resources=resources))
+    assert not compare(local, published)
+    local = write_index(tmp_path / "local.json", make_index(digest="sha256-sum:01"))
+    assert not compare(local, published)
@@ -0,0 +1,122 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+import structlog
+
+from common.fetch import FetchError, fetch_file, get_meta_path, get_part_path
+
+CONTENT = b"0123456789abcdefghij"
+ETAG = '"v1"'
+
+
+class Handler(BaseHTTPRequestHandler):
+    # behaviour of the stand-in server, set by the tests
+    mode = "normal"
+    requests: list[dict[str, str]] = []
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, status: int, body: bytes, headers: dict[str, str]):
+        self.send_response(status)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        range_ = self.headers.get("Range")
+        if range_ is None or self.mode == "ignore_range":
+            self.send_body(200, CONTENT, {})
+            return
+        start = int(range_.split("=")[1].rstrip("-"))
+        if self.mode == "wrong_start":
+            start -= 1
+        end, total = len(CONTENT) - 1, len(CONTENT)
+        body = CONTENT[start:]
+        if self.mode == "truncated":
+            body, total = body[:5], total + 5
+            end = start + 4
+        self.send_body(
+            206, body, {"Content-Range": "bytes %d-%d/%d" % (start, end, total)}
+        )
+
+
+@pytest.fixture
+def server():
+    Handler.mode = "normal"
+    Handler.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:%d/file.csv" % httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def context():
+    return SimpleNamespace(log=structlog.get_logger())
+
+
+def interrupt(path, url, size=5):
+    # leave a partial download behind, as an interrupted transfer would
+    get_part_path(path).write_bytes(CONTENT[:size])
+    meta = {"url": url, "etag": ETAG, "last_modified": None, "complete": False}
+    get_meta_path(path).write_text(json.dumps(meta))
+
+
+def test_not_modified(server, context, tmp_path):
+    path = tmp_path / "file.csv"
+    assert fetch_file(context, server, path)
+    assert path.read_bytes() == CONTENT
+    assert not fetch_file(context, server, path)
+    assert Handler.requests[-1]["If-None-Match"] == ETAG
+    assert path.read_bytes() == CONTENT
+
+
+def test_resume(server, context, tmp_path):
+    path = tmp_path / "file.csv"
+    interrupt(path, server)
+    assert fetch_file(context, server, path)
+    assert Handler.requests[-1]["Range"] == "bytes=5-"
+    assert Handler.requests[-1]["If-Range"] == ETAG
+    assert path.read_bytes() == CONTENT
+    assert not get_part_path(path).exists()
+
+
+def test_range_ignored(server, context, tmp_path):
+    Handler.mode = "ignore_range"
+    path = tmp_path / "file.csv"
+    interrupt(path, server)
+    assert fetch_file(context, server, path)
+    assert path.read_bytes() == CONTENT
+
+
+def test_wrong_range_start(server, context, tmp_path):
+    Handler.mode = "wrong_start"
+    path = tmp_path / "file.csv"
+    interrupt(path, server)
+    with pytest.raises(FetchError, match="Content-Range"):
+        fetch_file(context, server, path)
+    assert not path.exists()
+    assert not get_part_path(path).exists()
+
+
+def test_size_mismatch(server, context, tmp_path):
+    Handler.mode = "truncated"
+    path = tmp_path / "file.csv"
+    interrupt(path, server)
+    with pytest.raises(FetchError, match="Size mismatch"):
+        fetch_file(context, server, path)
+    assert not path.exists()
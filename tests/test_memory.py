@@ -0,0 +1,79 @@
+import pytest
+
+from common.memory import MemoryGovernor, parse_size
+
+
+class FakeProcess:
+    """
+    Consumers whose release frees their usage from the fake RSS.
+    """
+
+    def __init__(self, base: int, **usage: int):
+        self.base = base
+        self.usage = usage
+        self.released: list[str] = []
+
+    def rss(self) -> int:
+        return self.base + sum(self.usage.values())
+
+    def register(self, governor: MemoryGovernor):
+        for name in self.usage:
+            governor.register(
+                name, lambda n=name: self.usage[n], lambda n=name: self.release(n)
+            )
+
+    def release(self, name: str):
+        self.released.append(name)
+        self.usage[name] = 0
+
+
+def make_governor(process: FakeProcess) -> MemoryGovernor:
+    governor = MemoryGovernor(1000, high=0.85, low=0.70, interval=0, rss=process.rss)
+    process.register(governor)
+    return governor
+
+
+def test_below_high():
+    process = FakeProcess(300, a=100, b=300, c=140)
+    governor = make_governor(process)
+    governor.checkpoint()
+    assert process.released == []
+    assert governor.releases == 0
+
+
+def test_eviction_order():
+    # 950 used, 250 above the low watermark of 700
+    process = FakeProcess(350, a=100, b=300, c=200)
+    governor = make_governor(process)
+    governor.checkpoint()
+    # the largest consumer suffices, the others are kept
+    assert process.released == ["b"]
+    assert process.rss() <= 700
+
+
+def test_low_watermark():
+    # 1000 used, 300 above the low watermark
+    process = FakeProcess(400, a=100, b=200, c=250, d=0, e=50)
+    governor = make_governor(process)
+    governor.checkpoint()
+    assert process.released == ["c", "b"]
+    assert process.rss() <= 700
+    # back below the high watermark, nothing else is released
+    governor.checkpoint()
+    assert governor.releases == 2
+
+
+def test_no_limit():
+    process = FakeProcess(10_000, a=100)
+    governor = make_governor(process)
+    governor.configure(None)
+    governor.checkpoint()
+    assert process.released == []
+
+
+def test_parse_size():
+    assert parse_size("512") == 512
+    assert parse_size("4G") == 4 * 1024**3
+    assert parse_size("1.5 MiB") == int(1.5 * 1024**2)
+    with pytest.raises(ValueError):
+        parse_size("lots")
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+import structlog
+
+from common.pipeline import EmitQueue, pipeline
+
+
+class Item:
+    def __init__(self, ix: int):
+        self.ix = ix
+
+    def clone(self) -> "Item":
+        return Item(self.ix)
+
+
+class FakeSink:
+    """
+    Stands in for the zavod context the writer thread emits to, optionally
+    slow or failing on a given entity.
+    """
+
+    def __init__(self, delay: float = 0.0, fail_at: int | None = None):
+        self.delay = delay
+        self.fail_at = fail_at
+        self.emitted: list[int] = []
+        self.log = structlog.get_logger()
+
+    def emit(self, item: Item):
+        if item.ix == self.fail_at:
+            raise ValueError("Sink failed")
+        time.sleep(self.delay)
+        self.emitted.append(item.ix)
+
+
+def wait_for(predicate, timeout: float = 5.0):
+    end = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < end, "Timed out"
+        time.sleep(0.001)
+
+
+def test_watermarks():
+    queue = EmitQueue(high=4, low=1)
+    for ix in range(4):
+        queue.put(Item(ix))
+    producer = threading.Thread(target=queue.put, args=(Item(4),))
+    producer.start()
+    wait_for(lambda: queue.throttled)
+    # above the low watermark the producer stays blocked
+    assert [i.ix for i in queue.get_batch(2)] == [0, 1]
+    producer.join(0.05)
+    assert producer.is_alive()
+    assert queue.throttled
+    assert [i.ix for i in queue.get_batch(1)] == [2]
+    producer.join(5)
+    assert not producer.is_alive()
+    assert not queue.throttled
+    assert queue.throttle_count == 1
+    assert [i.ix for i in queue.get_batch()] == [3, 4]
+
+
+def test_invalid_watermarks():
+    with pytest.raises(ValueError):
+        EmitQueue(high=2, low=2)
+
+
+def test_flush_on_close():
+    sink = FakeSink(delay=0.0005)
+    with pipeline(sink, high=10, low=2) as context:
+        for ix in range(500):
+            context.emit(Item(ix))
+    assert sink.emitted == list(range(500))
+    assert context.queue.throttle_count > 0
+    assert context.queue.depth == 0
+
+
+def test_writer_error_in_emit():
+    sink = FakeSink(fail_at=3)
+    with pytest.raises(RuntimeError) as exc:
+        with pipeline(sink, high=2, low=1) as context:
+            for ix in range(10_000):
+                context.emit(Item(ix))
+    assert isinstance(exc.value.__cause__, ValueError)
+    # the producer was stopped long before the end of its loop
+    assert context.queue.put_count < 10_000
+    assert sink.emitted == [0, 1, 2]
+
+
+def test_writer_error_on_close():
+    sink = FakeSink(delay=0.01, fail_at=2)
+    with pytest.raises(RuntimeError) as exc:
+        with pipeline(sink, high=100, low=10) as context:
+            for ix in range(3):
+                context.emit(Item(ix))
+    assert isinstance(exc.value.__cause__, ValueError)
+    assert context.queue.put_count == 3
@@ -0,0 +1,20 @@
+from common.sampling import Sampler, get_fraction, make_key
+
+
+def test_make_key():
+    assert make_key(12345) == "12345"
+    assert make_key(None, " ", "") is None
+    assert make_key("a", None, 1) == "a|1"
+
+
+def test_numeric_keys():
+    assert get_fraction(12345) == get_fraction("12345")
+    sampler = Sampler(rate=0.5)
+    assert sampler.selects(12345) == sampler.selects(make_key(12345))
+
+
+def test_limit():
+    sampler = Sampler(limit=2)
+    assert sampler.accept("a") and sampler.accept("b")
+    assert sampler.exhausted
+    assert not sampler.accept("c")
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+from zavod import init_context
+
+from common.memory import get_governor
+from common.scheduler import UnitError, WorkUnit, run_units
+
+
+def parse_unit(context, unit: WorkUnit) -> int:
+    proxy = context.make("Person")
+    proxy.id = context.make_slug(unit.member)
+    proxy.add("name", unit.member)
+    context.emit(proxy)
+    if unit.member == "broken.csv":
+        raise ValueError("Broken unit")
+    return 1
+
+
+@pytest.fixture
+def context(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "metadata.yml").write_text("name: test\ntitle: Test\nprefix: test\n")
+    with init_context("metadata.yml", data_path=tmp_path / "data") as context:
+        yield context
+
+
+def make_units(*members: str) -> list[WorkUnit]:
+    return [WorkUnit("archive.zip", m, None, 1) for m in members]
+
+
+def test_run_units(context):
+    results = run_units(context, parse_unit, make_units("a.csv", "b.csv"), 1)
+    assert [r.rows for r in results] == [1, 1]
+    fragments = list(context.get_resource_path("").glob("fragments.*.json"))
+    assert len(fragments) == 2
+    for path in fragments:
+        data = json.loads(path.read_text())
+        assert "test" in data["datasets"]
+
+
+def test_failed_units(context):
+    units = make_units("broken.csv", "a.csv")
+    with pytest.raises(UnitError, match="1 of 2 units failed"):
+        run_units(context, parse_unit, units, 1)
+    # the other units still ran, the partial fragments of the broken one are
+    # removed
+    broken, key = units[0].key, units[1].key
+    assert context.get_resource_path(f"fragments.{key}.json").stat().st_size
+    assert not context.get_resource_path(f"fragments.{broken}.json").exists()
+
+
+def get_limit(context, unit: WorkUnit) -> int:
+    return get_governor().limit
+
+
+def test_worker_budget(context):
+    governor = get_governor()
+    governor.configure(4_000)
+    try:
+        results = run_units(context, get_limit, make_units("a.csv", "b.csv"), 2)
+    finally:
+        governor.configure(None)
+    # the rows of `get_limit` are the budget seen in the worker
+    assert [r.rows for r in results] == [2_000, 2_000]
@@ -0,0 +1,28 @@
+import json
+
+from common.stats import EntityStats
+
+
+def make_payment(*amounts: str, currency: str = "GBP") -> dict:
+    return {
+        "id": "payment",
+        "schema": "Payment",
+        "properties": {"amount": list(amounts), "currency": [currency]},
+    }
+
+
+def test_amounts():
+    stats = EntityStats()
+    stats.update(make_payment("10.5", "n/a"))
+    stats.update(make_payment("0.25"))
+    stats.update(make_payment("100", currency="EUR"))
+    assert stats.to_dict()["amounts"] == {"EUR": 100.0, "GBP": 10.75}
+
+
+def test_non_finite_amounts():
+    stats = EntityStats()
+    stats.update(make_payment("nan", "10"))
+    stats.update(make_payment("inf", "-Infinity", "NaN"))
+    data = stats.to_dict()
+    assert data["amounts"] == {"GBP": 10.0}
+    json.dumps(data, allow_nan=False)
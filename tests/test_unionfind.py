@@ -0,0 +1,48 @@
+import itertools
+
+from common.unionfind import UnionFind
+
+PAIRS = [("b", "c"), ("d", "a"), ("c", "d"), ("x", "y")]
+
+
+def make(pairs) -> UnionFind:
+    uf = UnionFind()
+    for a, b in pairs:
+        uf.union(a, b)
+    return uf
+
+
+def test_components():
+    uf = make(PAIRS)
+    assert len(uf) == 6
+    assert uf.find(uf.ids["a"]) == uf.find(uf.ids["c"])
+    assert uf.find(uf.ids["a"]) != uf.find(uf.ids["x"])
+
+
+def test_canonical_is_order_independent():
+    expected = {"b": "a", "c": "a", "d": "a", "y": "x"}
+    for pairs in itertools.permutations(PAIRS):
+        for flipped in itertools.product((False, True), repeat=len(pairs)):
+            pairs_ = [(b, a) if f else (a, b) for (a, b), f in zip(pairs, flipped)]
+            assert dict(make(pairs_).canonical()) == expected
+
+
+def get_depth(uf: UnionFind, ix: int) -> int:
+    depth = 0
+    while uf.parents[ix] != ix:
+        ix, depth = uf.parents[ix], depth + 1
+    return depth
+
+
+def test_path_halving():
+    uf = UnionFind()
+    for ix in range(9):
+        uf.intern(str(ix))
+    # a degenerate chain 8 -> 7 -> ... -> 0, which `union` by rank avoids
+    for ix in range(1, 9):
+        uf.parents[ix] = ix - 1
+    assert get_depth(uf, 8) == 8
+    assert uf.find(8) == 0
+    assert get_depth(uf, 8) == 4
+    assert uf.find(8) == 0
+    assert get_depth(uf, 8) == 2
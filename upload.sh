@@ -6,5 +6,14 @@
 #
 # example:
 #   bash ../../scripts/upload.sh icij_offshoreleaks data/export
+#
+# the upload is skipped if the entity digest and the dataset metadata (title,
+# summary, resources, ...) in the local index.json match the published ones,
+# set FORCE=1 to upload anyway
+
+if [ -z "$FORCE" ] && python -m common.digest compare $2/index.json https://data.followthegrant.org/$1/index.json; then
+    echo "Digest and metadata of $1 unchanged, skipping upload."
+    exit 0
+fi
 
 aws s3 --endpoint-url https://minio.ninja sync --no-progress $2 s3://data.followthegrant.org/$1